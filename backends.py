@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+""" Backends - key/value storage used by the page caches and the publication store
+
+DirectoryBackend - one file per key under a root directory
+SqliteBackend - one SQLite database (WAL mode), shared by every process on the machine
+open_backend - build a backend from a kind ('directory' or 'sqlite') and a location
+
+Both can be shared by several worker processes.  Their lock(key) context manager is held across processes, so
+only one worker at a time fetches and parses a given publication (see patentapi.load_publication).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+# How often a waiting lock() checks whether the lock was released (seconds)
+LOCK_POLL_INTERVAL = 0.05
+
+
+class DirectoryBackend ( object ):
+    """ Stores bytes values as files under <root>.
+            Keys may contain '/' to group values into sub-directories (e.g. 'html/US8000000').
+            Writes go through a temporary file and a rename, so readers never see a partial value.
+    """
+
+    def __init__( self, root ):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __path( self, key ):
+        parts = [quote(part, safe='') for part in key.split('/')]
+        return os.path.join(self.root, *parts)
+
+    def get( self, key ):
+        try:
+            with open(self.__path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set( self, key, value ):
+        import tempfile
+
+        path = self.__path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except:
+            os.unlink(tmp)
+            raise
+
+    def delete( self, key ):
+        try: os.unlink(self.__path(key))
+        except FileNotFoundError: pass
+
+    def keys( self, prefix='' ):
+        ''' Yield every key starting with <prefix> '''
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            relative = os.path.relpath(dirpath, self.root)
+            if relative == '.' and '.locks' in dirnames:
+                dirnames.remove('.locks')
+            parts = [] if relative == '.' else [unquote(part) for part in relative.split(os.sep)]
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                key = '/'.join(parts + [unquote(filename)])
+                if key.startswith(prefix):
+                    yield key
+
+    @contextmanager
+    def lock( self, key, timeout=30 ):
+        ''' Hold an exclusive lock on <key> across threads and processes (a flock on a file under .locks).
+            Yields True once the lock is held, or False if <timeout> seconds passed first.
+            The lock file is removed on release, so .locks only holds the locks in use. '''
+        import fcntl
+
+        directory = os.path.join(self.root, '.locks')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, quote(key, safe=''))
+        deadline = time.monotonic() + timeout
+
+        f = None
+        acquired = False
+        while True:
+            if f is None:
+                f = open(path, 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(LOCK_POLL_INTERVAL)
+                continue
+
+            # The holder we waited for may have removed the file (and another worker created a new one) before
+            # releasing it, in which case this lock is on a file nobody else will see: try again with the current one
+            try: current = os.stat(path).st_ino
+            except FileNotFoundError: current = None
+            if current == os.fstat(f.fileno()).st_ino:
+                acquired = True
+                break
+            f.close()
+            f = None
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                # Removed while still held, so a worker that opens the path afterwards creates a new file
+                try: os.unlink(path)
+                except FileNotFoundError: pass
+                fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+
+class SqliteBackend ( object ):
+    """ Stores bytes values in a single SQLite database at <path>.
+            The database is in WAL mode, so readers don't block the writer, and it is safe to share between threads
+            and worker processes: each thread of each process opens its own connection on first use.
+            Locks are rows with an expiry time (<lease> seconds), so a worker that dies holding one only delays the
+            others until the lease runs out.  A live holder renews the lease every <lease>/3 seconds, however long
+            it holds the lock.
+    """
+
+    def __init__( self, path, lease=60 ):
+        self.path = path
+        self.lease = lease
+        self.__local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.__connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, '
+                               'expires REAL NOT NULL)')
+
+    def __connection( self ):
+        # A connection must not be used across fork(), so they are per process as well as per thread
+        if getattr(self.__local, 'pid', None) != os.getpid():
+            import sqlite3
+
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.__local.connection = connection
+            self.__local.pid = os.getpid()
+        return self.__local.connection
+
+    def get( self, key ):
+        row = self.__connection().execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set( self, key, value ):
+        with self.__connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)', (key, value))
+
+    def delete( self, key ):
+        with self.__connection() as connection:
+            connection.execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def keys( self, prefix='' ):
+        ''' Yield every key starting with <prefix> '''
+        if not prefix:
+            rows = self.__connection().execute('SELECT key FROM kv ORDER BY key').fetchall()
+        else:
+            # Every key with the prefix sorts between the prefix and the prefix with its last character incremented
+            end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            rows = self.__connection().execute('SELECT key FROM kv WHERE key >= ? AND key < ? ORDER BY key',
+                                               (prefix, end)).fetchall()
+        for row in rows:
+            yield row[0]
+
+    @contextmanager
+    def lock( self, key, timeout=30 ):
+        ''' Hold an exclusive lock on <key> across threads and processes.
+            Yields True once the lock is held, or False if <timeout> seconds passed first. '''
+        import uuid
+
+        connection = self.__connection()
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+
+        acquired = False
+        while True:
+            now = time.time()
+            with connection:
+                connection.execute('DELETE FROM locks WHERE key = ? AND expires < ?', (key, now))
+                cursor = connection.execute('INSERT OR IGNORE INTO locks (key, token, expires) VALUES (?, ?, ?)',
+                                            (key, token, now + self.lease))
+            if cursor.rowcount:
+                acquired = True
+                break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(LOCK_POLL_INTERVAL)
+
+        released = threading.Event()
+        if acquired:
+            renewer = threading.Thread(target=self.__renew, args=(key, token, released), name='lease ' + key,
+                                       daemon=True)
+            renewer.start()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                released.set()
+                renewer.join()
+                with connection:
+                    connection.execute('DELETE FROM locks WHERE key = ? AND token = ?', (key, token))
+
+    def __renew( self, key, token, released ):
+        # Runs while the lock is held (e.g. over slow upstream requests), so the lease never runs out under a live
+        # holder; a failed renewal (e.g. a busy database) is tried again next time
+        while not released.wait(self.lease / 3.0):
+            try:
+                with self.__connection() as connection:
+                    connection.execute('UPDATE locks SET expires = ? WHERE key = ? AND token = ?',
+                                       (time.time() + self.lease, key, token))
+            except Exception:
+                pass
+
+
+BACKENDS = {'directory': DirectoryBackend,
+            'sqlite': SqliteBackend}
+
+
+def open_backend( kind, location ):
+    ''' open_backend('directory', 'data/') or open_backend('sqlite', 'data/cache.sqlite3') '''
+    try: backend = BACKENDS[kind]
+    except KeyError:
+        raise ValueError("Unknown cache backend, '" + str(kind) + "'.")
+    return backend(location)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+""" Micro-benchmark for the bibdata table extraction.
+
+Compares the original if-chain loop (one getText().lower() per branch, datetime.strptime inside try/except)
+with extraction.extract_bibdata (heading -> handler dispatch, cached date parser) on saved Google Patents pages.
+
+    python benchmarks/bench_bibdata.py [page.html ...]
+
+With no arguments every page in benchmarks/fixtures is used.  Pages are parsed once up front so only the
+table extraction is timed.
+"""
+
+import glob
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import htmlmin
+from extraction import extract_bibdata, make_soup, parse_date
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '*.html')
+
+
+def legacy_bibdata( soup, biblio ):
+    ''' The bibdata loop as it was before the dispatch table, kept here as the baseline '''
+    biblio['kind_code'] = None
+    soupTable = soup.find("table", class_="patent-bibdata")
+    biblio_list = soupTable.find_all("td", class_="patent-bibdata-heading")
+
+    for item in biblio_list:
+        if (((item.getText()).lower() == 'publication number') and not(biblio['kind_code'])):
+            full_num = item.next_sibling.getText()
+            biblio['kind_code'] = full_num[-2:].strip()
+            biblio['country_code'] = full_num[:2].strip()
+            biblio['publication_number'] = (full_num[2:-2]).strip()
+        if ((item.getText()).lower() == 'application number'):
+            app_num = (item.next_sibling.getText()).strip()
+            biblio['application_number'] = app_num[2:len(app_num)].strip()
+        try:
+            if ((item.getText()).lower() == 'priority date'):
+                biblio['priority_date'] = datetime.strptime((item.next_sibling.getText()).strip(), '%b %d, %Y').strftime('%Y-%m-%d')
+        except:
+            pass
+        try:
+            if ((item.getText()).lower() == 'publication date'):
+                biblio['publication_date'] = datetime.strptime((item.next_sibling.getText()).strip(), '%b %d, %Y').strftime('%Y-%m-%d')
+        except:
+            pass
+        try:
+            if ((item.getText()).lower() == 'filing date'):
+                biblio['filing_date'] = datetime.strptime((item.next_sibling.getText()).strip(), '%b %d, %Y').strftime('%Y-%m-%d')
+        except:
+            pass
+        if ((item.getText()).lower() == 'also published as'):
+            biblio['family_members'] = (item.next_sibling.getText()).strip().split(", ")
+        if ((item.getText()).lower() == 'inventors'):
+            biblio['inventors'] = (item.next_sibling.getText()).strip().split(', ')
+        if ((item.getText()).lower() == 'original assignee'):
+            biblio['assignee'] = (item.next_sibling.getText()).strip()
+
+
+def per_page_us( func, soup, number ):
+    timer = timeit.Timer(lambda: func(soup, {}))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main( paths, number=2000 ):
+    print('{0:<40} {1:>12} {2:>12} {3:>8}'.format('page', 'before (us)', 'after (us)', 'speedup'))
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            soup = make_soup(htmlmin.minify(f.read()))
+
+        before = per_page_us(legacy_bibdata, soup, number)
+        parse_date.cache_clear()
+        after = per_page_us(extract_bibdata, soup, number)
+        print('{0:<40} {1:>12.1f} {2:>12.1f} {3:>7.2f}x'.format(os.path.basename(path), before, after, before / after))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or sorted(glob.glob(FIXTURES)))
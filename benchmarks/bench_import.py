@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+""" Import-time guard for the API service and CLI entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for each module, reports the cumulative
+import time, and fails (exit status 1) when a module pulls in one of the heavy parsing/fetching modules at import
+time or takes longer than --max-ms.
+
+    python benchmarks/bench_import.py [--max-ms 250] [--repeat 5] [module ...]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules that should not be imported at all until a page is fetched or parsed
+HEAVY_MODULES = ('bs4', 'lxml', 'htmlmin', 'zipfile', 'urllib.request', 'pyarrow', 'msgpack', 'numpy')
+
+# Heavy modules a given entry point can't avoid (Flask's own imports pull in zipfile)
+ALLOWED = {'flask_app': ('zipfile',)}
+
+DEFAULT_MODULES = ('flask_app', 'patentapi', 'patent_helper', 'extraction', 'cache', 'refresh', 'classification',
+                   'transport', 'similarity', 'export')
+
+
+def import_time( module ):
+    ''' Return ({imported module: cumulative us}, total us) for importing <module> in a fresh interpreter '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            cwd=ROOT, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True)
+    if result.returncode:
+        raise RuntimeError('importing {0} failed:\n{1}'.format(module, result.stderr))
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = [field.strip() for field in line[len('import time:'):].split('|')]
+        if fields[1].isdigit():
+            imported[fields[2]] = int(fields[1])
+    return imported, imported.get(module, 0)
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Measure and guard module import time.')
+    parser.add_argument('--max-ms', type=float, default=250.0, help='fail when a module takes longer (default 250)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per module; the fastest is reported (default 5)')
+    parser.add_argument('modules', nargs='*', help='modules to import (default: %s)' % ', '.join(DEFAULT_MODULES))
+    args = parser.parse_args(argv)
+
+    failures = []
+    print('{0:<20} {1:>10}  {2}'.format('module', 'ms', 'heavy imports'))
+    for module in args.modules or DEFAULT_MODULES:
+        runs = [import_time(module) for i in range(args.repeat)]
+        imported, total = min(runs, key=lambda run: run[1])
+        heavy = sorted(name for name in imported if name in HEAVY_MODULES and name not in ALLOWED.get(module, ()))
+
+        print('{0:<20} {1:>10.1f}  {2}'.format(module, total / 1000.0, ', '.join(heavy) or '-'))
+        if heavy:
+            failures.append('{0} imports {1}'.format(module, ', '.join(heavy)))
+        if total / 1000.0 > args.max_ms:
+            failures.append('{0} took {1:.1f}ms (limit {2:.1f}ms)'.format(module, total / 1000.0, args.max_ms))
+
+    for failure in failures:
+        print('FAIL: ' + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+""" Load test for the whole fetch -> parse -> serialize pipeline, without touching the live hosts.
+
+First record the publications once (this is the only step that goes to the network):
+
+    python benchmarks/bench_pipeline.py --record archive/ US8123456 US8623013 ...
+
+then replay them as often as needed, with concurrent workers and injected latency/errors:
+
+    python benchmarks/bench_pipeline.py --replay archive/ --workers 8 --rounds 5 \
+        --latency-ms 120 --jitter-ms 80 --error-rate 0.01 --seed 1 US8123456 US8623013 ...
+
+Each request is patentapi.load_publication without caches followed by to_dict(), i.e. a cold API request.
+Throughput and the latency percentiles are printed; with the same --seed the injected delays and failures are
+the same from run to run, whatever the number of --workers (each request's draws depend only on the seed, the
+request and how often it was made before).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import transport
+from patentapi import load_publication
+
+
+def percentile( ordered, fraction ):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def timed_load( pub_num ):
+    ''' Return (seconds, error or None) for one cold request '''
+    started = time.perf_counter()
+    try:
+        pat = load_publication(pub_num)
+        if not pat.biblio:
+            raise RuntimeError('no result')
+        pat.to_dict()
+        error = None
+    except Exception as e:
+        error = e
+    return time.perf_counter() - started, error
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Measure pipeline throughput and tail latency from a replay archive.')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--record', metavar='DIR', help='fetch the publications live and record them to DIR')
+    mode.add_argument('--replay', metavar='DIR', help='replay the publications from DIR')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests (default 4)')
+    parser.add_argument('--rounds', type=int, default=1, help='times each publication is requested (default 1)')
+    parser.add_argument('--latency-ms', default='0', help="added per upstream request, or 'recorded' (default 0)")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='extra uniform random delay (default 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream requests that fail')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the jitter and injected errors')
+    parser.add_argument('pub_nums', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        transport.set_transport(transport.RecordingTransport(args.record))
+        for pub_num in args.pub_nums:
+            seconds, error = timed_load(pub_num)
+            print('{0:<16} {1:>8.1f}ms  {2}'.format(pub_num, seconds * 1000.0, error or 'recorded'))
+        return 0
+
+    latency = 'recorded' if args.latency_ms == 'recorded' else float(args.latency_ms) / 1000.0
+    transport.set_transport(transport.ReplayTransport(args.replay, latency=latency, jitter=args.jitter_ms / 1000.0,
+                                                      error_rate=args.error_rate, seed=args.seed))
+
+    requests = list(args.pub_nums) * args.rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(timed_load, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000.0 for seconds, error in results)
+    errors = [error for seconds, error in results if error is not None]
+
+    print('requests     {0}'.format(len(results)))
+    print('errors       {0}'.format(len(errors)))
+    print('throughput   {0:.1f} req/s'.format(len(results) / elapsed))
+    for label, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('max', 1.0)):
+        print('{0:<12} {1:.1f}ms'.format(label, percentile(latencies, fraction)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+""" Cache - stored copies of fetched Google Patents pages and USPTO PAIR data
+
+HtmlCache - page HTML plus the validators (ETag, Last-Modified, content hash) needed to revalidate it
+PairCache - parsed USPTO PAIR archive members per application number
+ParsedCache - fully extracted publications (GooglePatentPublication.biblio) in a compact binary encoding
+"""
+
+import hashlib
+import json
+import marshal
+import time
+
+from extraction import PARSER_VERSION
+
+
+def content_hash( html ):
+    return hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+
+class HtmlCache ( object ):
+    """ Page cache on top of a key/value backend (see backends.py).
+            get() returns a dict with 'html', 'etag', 'last_modified', 'sha1' and 'fetched', or None on a miss.
+            Only whole pages belong here: the reduced page extraction.fetch_page returns for an oversized one would be
+            re-parsed as if it were complete by later parser versions.
+    """
+
+    def __init__( self, backend ):
+        self.backend = backend
+
+    def get( self, pub_num ):
+        meta = self.get_meta(pub_num)
+        if meta is None:
+            return None
+
+        html = self.backend.get('html/' + pub_num)
+        if html is None:
+            return None
+
+        meta['html'] = html.decode('utf-8')
+        return meta
+
+    def get_meta( self, pub_num ):
+        ''' Return the validators for <pub_num> without loading the page itself '''
+        meta = self.backend.get('meta/' + pub_num)
+        if meta is None:
+            return None
+        return json.loads(meta.decode('utf-8'))
+
+    def put( self, pub_num, html, etag=None, last_modified=None ):
+        meta = {'etag': etag,
+                'last_modified': last_modified,
+                'sha1': content_hash(html),
+                'fetched': time.time()}
+
+        # The page is written before its metadata, so a reader that finds the metadata always finds the page
+        self.backend.set('html/' + pub_num, html.encode('utf-8'))
+        self.backend.set('meta/' + pub_num, json.dumps(meta).encode('utf-8'))
+        return meta
+
+    def delete( self, pub_num ):
+        # The metadata goes first, so get_meta never reports a page that is already gone
+        self.backend.delete('meta/' + pub_num)
+        self.backend.delete('html/' + pub_num)
+
+    def touch( self, pub_num ):
+        ''' Record that the cached page was revalidated without change '''
+        meta = self.get_meta(pub_num)
+        if meta is not None:
+            meta['fetched'] = time.time()
+            self.backend.set('meta/' + pub_num, json.dumps(meta).encode('utf-8'))
+
+    def keys( self ):
+        return [key[len('meta/'):] for key in self.backend.keys('meta/')]
+
+
+class PairCache ( object ):
+    """ Parsed USPTO PAIR archive members (see pair.py), one JSON value per application number and member """
+
+    def __init__( self, backend ):
+        self.backend = backend
+
+    def get( self, application_number, member ):
+        value = self.backend.get('pair/' + application_number + '/' + member)
+        if value is None:
+            return None
+        return json.loads(value.decode('utf-8'))
+
+    def put( self, application_number, member, value ):
+        self.backend.set('pair/' + application_number + '/' + member, json.dumps(value).encode('utf-8'))
+
+
+def _msgpack():
+    ''' msgpack is optional (marshal is used without it) and only imported once a value is encoded or decoded '''
+    try: import msgpack
+    except ImportError: return None
+    return msgpack
+
+
+class ParsedCache ( object ):
+    """ Extraction results keyed by publication number and extraction.PARSER_VERSION, so a cache hit skips parsing
+        entirely and entries written by an older parser are never read again (purge() deletes them).
+            Values are msgpack-encoded when msgpack is installed, marshal-encoded otherwise; the first byte records
+            which, so either can be read back.
+    """
+
+    MSGPACK = b'M'
+    MARSHAL = b'P'
+
+    def __init__( self, backend, version=PARSER_VERSION ):
+        self.backend = backend
+        self.version = version
+
+    def __key( self, pub_num ):
+        return 'parsed/' + self.version + '/' + pub_num
+
+    def get( self, pub_num ):
+        value = self.backend.get(self.__key(pub_num))
+        if not value:
+            return None
+
+        encoding, payload = value[:1], value[1:]
+        msgpack = _msgpack()
+        if encoding == self.MSGPACK and msgpack is not None:
+            return msgpack.unpackb(payload, raw=False)
+        if encoding == self.MARSHAL:
+            try: return marshal.loads(payload)
+            except (EOFError, ValueError, TypeError): return None     # written by another Python version
+        return None
+
+    def put( self, pub_num, biblio ):
+        msgpack = _msgpack()
+        if msgpack is not None:
+            value = self.MSGPACK + msgpack.packb(biblio, use_bin_type=True)
+        else:
+            value = self.MARSHAL + marshal.dumps(biblio)
+        self.backend.set(self.__key(pub_num), value)
+
+    def delete( self, pub_num ):
+        self.backend.delete(self.__key(pub_num))
+
+    def purge( self ):
+        ''' Delete the entries written by any other parser version; returns how many were deleted '''
+        current = 'parsed/' + self.version + '/'
+        stale = [key for key in self.backend.keys('parsed/') if not key.startswith(current)]
+        for key in stale:
+            self.backend.delete(key)
+        return len(stale)
+
+    def __contains__( self, pub_num ):
+        return self.backend.get(self.__key(pub_num)) is not None
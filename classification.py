@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+""" Classification - parsed classification codes and a prefix index over stored publications
+
+parse_code -           split a CPC/IPC/ECLA or US code into its levels and a compact integer key
+prefix_range -         the [low, high) key range holding every code under a prefix such as 'H04L 9/'
+ClassificationIndex -  sorted (key, publication) arrays per scheme, for prefix lookups and per-subtree counts
+
+Keys are packed so that every subtree is one contiguous integer range:
+
+    CPC/IPC/ECLA   section (5 bits) | class (7) | subclass (5) | main group (14) | subgroup (20)
+    US             kind (2) + class (10)        | subclass (14) | subclass decimals (20)
+
+where the US kind is 0 for utility classes, 1 for design ('D') and 2 for plant ('PLT').
+
+Subgroup (and US subclass decimal) digits are left-aligned, so 'H04L 9/32' covers 9/32, 9/3247, 9/3263, ...
+"""
+
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from backends import open_backend
+from indexfile import read_index, write_index
+from store import PublicationStore
+
+# Schemes as named in GooglePatentPublication.classifications
+US = 'us_classifications'
+IPC = 'international_classifications'
+CPC = 'cooperative_classifications'
+ECLA = 'ep_classifications'
+SCHEMES = (US, IPC, CPC, ECLA)
+
+# Levels of a parsed code, from the top of the hierarchy down
+SECTION, CLASS, SUBCLASS, MAIN_GROUP, SUBGROUP = range(5)
+
+# For US codes only class_, subclass and subgroup (the digits after the subclass's decimal point) are set
+Classification = namedtuple('Classification', ['scheme', 'section', 'class_', 'subclass', 'main_group', 'subgroup',
+                                               'suffix', 'key', 'level'])
+
+SUBGROUP_DIGITS = 6
+# (width in bits, shift) of each level of a CPC/IPC/ECLA key
+CPC_FIELDS = ((5, 46), (7, 39), (5, 34), (14, 20), (20, 0))
+# (width in bits, shift) of each level of a US key: kind + class, subclass, subclass decimals
+US_FIELDS = ((12, 34), (14, 20), (20, 0))
+# Prefix of each kind of US class, by its value in the key's top two bits
+US_KINDS = ('', 'D', 'PLT')
+US_CLASS_BITS = 10
+
+CPC_PATTERN = re.compile(r'^\s*([A-HY])(?:\s*(\d{1,2})(?:\s*([A-Z])(?:\s*(\d{1,4})(?:\s*/\s*(\d{0,6})([A-Z0-9]*))?)?)?)?\s*$', re.IGNORECASE)
+US_PATTERN = re.compile(r'^\s*(D|PLT)?\s*(\d{1,3})(?:\s*/\s*(\d{0,4})(?:\.(\d{1,6}))?([A-Z]*))?\s*$', re.IGNORECASE)
+
+
+def _letter( ch ):
+    return ord(ch.upper()) - ord('A') + 1
+
+
+def _pack( fields, values ):
+    key = 0
+    for (width, shift), value in zip(fields, values):
+        key |= value << shift
+    return key
+
+
+def _range( fields, values, digits=None ):
+    ''' Key range covering every code that shares the given leading <values>.
+        <digits> is the number of left-aligned digits given for the last level, if it is a subgroup. '''
+    low = _pack(fields, values)
+    if digits is not None:
+        return low, low + 10 ** (SUBGROUP_DIGITS - digits)
+    width, shift = fields[len(values) - 1]
+    return low, low + (1 << shift)
+
+
+def _cpc_values( m ):
+    ''' Level values present in a CPC_PATTERN match, top down '''
+    values = [_letter(m.group(1))]
+    if m.group(2): values.append(int(m.group(2)))
+    if m.group(3): values.append(_letter(m.group(3)))
+    if m.group(4): values.append(int(m.group(4)))
+    if m.group(5): values.append(int(m.group(5).ljust(SUBGROUP_DIGITS, '0')))
+    return values
+
+
+def _us_values( m ):
+    values = [(US_KINDS.index((m.group(1) or '').upper()) << US_CLASS_BITS) + int(m.group(2))]
+    if m.group(3): values.append(int(m.group(3)))
+    if m.group(4): values.append(int(m.group(4).ljust(SUBGROUP_DIGITS, '0')))
+    return values
+
+
+def parse_code( code, scheme=CPC ):
+    ''' Parse <code> from <scheme> into a Classification, or return None if it can't be parsed '''
+    if scheme == US:
+        m = US_PATTERN.match(code)
+        if not m:
+            return None
+        values = _us_values(m)
+        return Classification(scheme, None, (m.group(1) or '').upper() + m.group(2), m.group(3) or None, None,
+                              m.group(4), (m.group(5) or None), _pack(US_FIELDS, values), len(values) - 1)
+
+    m = CPC_PATTERN.match(code)
+    if not m:
+        return None
+    values = _cpc_values(m)
+    return Classification(scheme, m.group(1).upper(), m.group(2), (m.group(3) or '').upper() or None, m.group(4),
+                          m.group(5) or None, (m.group(6) or None), _pack(CPC_FIELDS, values), len(values) - 1)
+
+
+def prefix_range( prefix, scheme=CPC ):
+    ''' Return the [low, high) key range of all codes under <prefix> (e.g. 'H04L', 'H04L 9/', 'H04L 9/32'),
+        or None if the prefix can't be parsed '''
+    prefix = prefix.strip().rstrip('/')
+    if scheme == US:
+        m = US_PATTERN.match(prefix)
+        return _range(US_FIELDS, _us_values(m), len(m.group(4)) if m.group(4) else None) if m else None
+
+    m = CPC_PATTERN.match(prefix)
+    return _range(CPC_FIELDS, _cpc_values(m), len(m.group(5)) if m.group(5) else None) if m else None
+
+
+def subtree_key( key, level, scheme=CPC ):
+    ''' Truncate <key> to its ancestor at <level> (SECTION ... SUBGROUP for CPC; 0-2 for US) '''
+    fields = US_FIELDS if scheme == US else CPC_FIELDS
+    width, shift = fields[level]
+    return (key >> shift) << shift
+
+
+def format_key( key, level, scheme=CPC ):
+    ''' Human readable form of a (possibly truncated) key, e.g. 'H04L 9/' '''
+    fields = US_FIELDS if scheme == US else CPC_FIELDS
+    values = [(key >> shift) & ((1 << width) - 1) for width, shift in fields[:level + 1]]
+
+    if scheme == US:
+        text = US_KINDS[values[0] >> US_CLASS_BITS] + str(values[0] & ((1 << US_CLASS_BITS) - 1))
+        if len(values) > 1: text += '/' + str(values[1])
+        if len(values) > 2 and values[2]: text += '.' + str(values[2]).rjust(SUBGROUP_DIGITS, '0').rstrip('0')
+        return text
+
+    text = chr(values[0] + ord('A') - 1)
+    if len(values) > 1: text += str(values[1]).rjust(2, '0')
+    if len(values) > 2: text += chr(values[2] + ord('A') - 1)
+    if len(values) > 3: text += ' ' + str(values[3]) + '/'
+    if len(values) > 4: text += (str(values[4]).rjust(SUBGROUP_DIGITS, '0').rstrip('0') or '00')
+    return text
+
+
+class ClassificationIndex ( object ):
+    """ Prefix index over the classification codes of a set of publications.
+            For each scheme, codes are held as a sorted array of keys with a parallel array of publication ordinals,
+            so a prefix lookup is two binary searches and a slice.
+    """
+
+    def __init__( self ):
+        self.ids = []            # ordinal -> publication id
+        self.keys = {}           # scheme -> array('q') of sorted keys
+        self.postings = {}       # scheme -> array('l') of publication ordinals, parallel to keys
+
+    @classmethod
+    def build( cls, records ):
+        ''' Build the index from publication records (GooglePatentPublication.dict's) '''
+        index = cls()
+        pairs = {scheme: [] for scheme in SCHEMES}
+
+        for record in records:
+            ordinal = len(index.ids)
+            index.ids.append(record.get('id'))
+            for scheme, codes in (record.get('classifications') or {}).items():
+                if scheme not in pairs:
+                    continue
+                for code in codes:
+                    parsed = parse_code(code, scheme)
+                    if parsed:
+                        pairs[scheme].append((parsed.key, ordinal))
+
+        for scheme, scheme_pairs in pairs.items():
+            scheme_pairs.sort()
+            index.keys[scheme] = array('q', (key for key, ordinal in scheme_pairs))
+            index.postings[scheme] = array('l', (ordinal for key, ordinal in scheme_pairs))
+        return index
+
+    def __slice( self, prefix, scheme ):
+        bounds = prefix_range(prefix, scheme)
+        if bounds is None:
+            raise ValueError("Invalid classification prefix, '" + str(prefix) + "'.")
+        keys = self.keys.get(scheme, array('q'))
+        return bisect_left(keys, bounds[0]), bisect_left(keys, bounds[1])
+
+    def lookup( self, prefix, scheme=CPC ):
+        ''' Ids of the publications with at least one <scheme> code under <prefix>, in index order '''
+        low, high = self.__slice(prefix, scheme)
+        ordinals = sorted(set(self.postings[scheme][low:high]))
+        return [self.ids[ordinal] for ordinal in ordinals]
+
+    def count( self, prefix, scheme=CPC ):
+        ''' Number of publications with at least one <scheme> code under <prefix> '''
+        low, high = self.__slice(prefix, scheme)
+        return len(set(self.postings[scheme][low:high]))
+
+    def subtree_counts( self, prefix, level, scheme=CPC ):
+        ''' Publications per subtree at <level> below <prefix>, e.g. subtree_counts('H04L', MAIN_GROUP)
+            gives {'H04L 9/': n, 'H04L 29/': m, ...}.  A publication is counted once per subtree. '''
+        low, high = self.__slice(prefix, scheme)
+        keys = self.keys[scheme]
+        postings = self.postings[scheme]
+
+        seen = set()
+        counts = Counter()
+        for i in range(low, high):
+            subtree = subtree_key(keys[i], level, scheme)
+            if (subtree, postings[i]) not in seen:
+                seen.add((subtree, postings[i]))
+                counts[subtree] += 1
+        return {format_key(key, level, scheme): n for key, n in sorted(counts.items())}
+
+    def save( self, path ):
+        ''' Write the index to <path> (see indexfile.py) '''
+        schemes = list(self.keys)
+        arrays = [values for scheme in schemes for values in (self.keys[scheme], self.postings[scheme])]
+        write_index(path, {'ids': self.ids, 'schemes': schemes}, arrays)
+
+    @classmethod
+    def load( cls, path ):
+        header, arrays = read_index(path, 'Classification index')
+        index = cls()
+        index.ids = header['ids']
+        for i, scheme in enumerate(header['schemes']):
+            index.keys[scheme], index.postings[scheme] = arrays[2 * i:2 * i + 2]
+        return index
+
+
+def build_index( location, backend='directory' ):
+    ''' Build a ClassificationIndex over every publication in the store at <location> (see backends.open_backend) '''
+    return ClassificationIndex.build(PublicationStore(open_backend(backend, location)))
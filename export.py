@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+""" Export - columnar (Arrow IPC) export of stored publications
+
+export_arrow -       write publications, claims, citations and classifications tables from a PublicationStore
+load_publications -  memory-map the publications table, filtering by publication date range and/or CPC prefix
+load_table -         memory-map any of the exported tables, optionally restricted to a set of publication ids
+
+Files are uncompressed Arrow IPC files, so they are read through a memory map without copying.  Country, kind code,
+assignee and classification columns are dictionary-encoded.  Requires pyarrow.
+
+    python export.py --data DIR [--backend sqlite] --out DIR
+"""
+
+import argparse
+import os
+from datetime import date
+
+from backends import BACKENDS, open_backend
+from classification import parse_code, prefix_range
+from extraction import claim_text
+from names import canonical_assignee
+from store import PublicationStore
+
+TABLES = ('publications', 'claims', 'citations', 'classifications')
+BATCH_SIZE = 10000
+
+
+def _require_pyarrow():
+    ''' Return (pyarrow, pyarrow.compute, pyarrow.ipc).  pyarrow is optional and only imported once a table is exported
+        or loaded. '''
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError('The columnar export requires pyarrow (pip install pyarrow)')
+    return pyarrow, pyarrow.compute, pyarrow.ipc
+
+
+def _schemas():
+    pa, pc, ipc = _require_pyarrow()
+    string_dict = pa.dictionary(pa.int32(), pa.string())
+    return {'publications': pa.schema([('id', pa.string()),
+                                       ('publication_number', pa.string()),
+                                       ('country_code', string_dict),
+                                       ('kind_code', string_dict),
+                                       ('application_number', pa.string()),
+                                       ('title', pa.string()),
+                                       ('abstract', pa.string()),
+                                       ('assignee', string_dict),
+                                       ('assignee_canonical', string_dict),
+                                       ('inventors', pa.list_(pa.string())),
+                                       ('family_members', pa.list_(pa.string())),
+                                       ('publication_date', pa.date32()),
+                                       ('filing_date', pa.date32()),
+                                       ('google_priority_date', pa.date32()),
+                                       ('file_history', pa.string())]),
+            'claims': pa.schema([('id', pa.string()),
+                                 ('number', pa.int32()),
+                                 ('depends_from', pa.int32()),
+                                 ('text', pa.string())]),
+            'citations': pa.schema([('id', pa.string()),
+                                    ('cited', pa.string()),
+                                    ('cited_country', string_dict),
+                                    ('cited_by_examiner', pa.bool_())]),
+            'classifications': pa.schema([('id', pa.string()),
+                                          ('scheme', string_dict),
+                                          ('code', string_dict)])}
+
+
+class _DictionaryEncoder ( object ):
+    """ Keeps one growing dictionary per column, so every batch's dictionary extends the previous one
+        and the writer only has to emit deltas """
+
+    def __init__( self ):
+        self.index = {}
+        self.values = []
+
+    def encode( self, values ):
+        pa, pc, ipc = _require_pyarrow()
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            i = self.index.get(value)
+            if i is None:
+                i = self.index[value] = len(self.values)
+                self.values.append(value)
+            indices.append(i)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, pa.string()))
+
+
+def _to_date( text ):
+    try: return date.fromisoformat(text) if text else None
+    except ValueError: return None
+
+
+class _TableWriter ( object ):
+    """ Buffers rows for one table and writes them out BATCH_SIZE at a time """
+
+    def __init__( self, path, schema ):
+        pa, pc, ipc = _require_pyarrow()
+        self.schema = schema
+        self.columns = {field.name: [] for field in schema}
+        self.encoders = {field.name: _DictionaryEncoder() for field in schema if pa.types.is_dictionary(field.type)}
+        self.writer = ipc.new_file(path, schema, options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        self.rows = 0
+
+    def append( self, row ):
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+        self.rows += 1
+        if self.rows >= BATCH_SIZE:
+            self.flush()
+
+    def flush( self ):
+        if not self.rows:
+            return
+        pa, pc, ipc = _require_pyarrow()
+        arrays = []
+        for field in self.schema:
+            values = self.columns[field.name]
+            if field.name in self.encoders:
+                arrays.append(self.encoders[field.name].encode(values))
+            else:
+                arrays.append(pa.array(values, field.type))
+            self.columns[field.name] = []
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows = 0
+
+    def close( self ):
+        self.flush()
+        self.writer.close()
+
+
+def export_arrow( records, directory ):
+    ''' Write the publication <records> (GooglePatentPublication.dict's) as Arrow IPC files under <directory>.
+        Returns the number of publications written. '''
+    _require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+
+    schemas = _schemas()
+    writers = {name: _TableWriter(os.path.join(directory, name + '.arrow'), schemas[name]) for name in TABLES}
+
+    count = 0
+    try:
+        for record in records:
+            pub_id = record.get('id')
+            if not pub_id:
+                continue
+
+            writers['publications'].append({'id': pub_id,
+                                            'publication_number': record.get('publication_number'),
+                                            'country_code': record.get('country_code'),
+                                            'kind_code': record.get('kind_code'),
+                                            'application_number': record.get('application_number'),
+                                            'title': record.get('title'),
+                                            'abstract': record.get('abstract'),
+                                            'assignee': record.get('assignee'),
+                                            'assignee_canonical': (record.get('assignee_canonical') or
+                                                                   canonical_assignee(record.get('assignee'))),
+                                            'inventors': record.get('inventors') or [],
+                                            'family_members': record.get('family_members') or [],
+                                            'publication_date': _to_date(record.get('publication_date')),
+                                            'filing_date': _to_date(record.get('filing_date')),
+                                            'google_priority_date': _to_date(record.get('google_priority_date')),
+                                            'file_history': record.get('file_history')})
+
+            for claim in record.get('claims') or []:
+                writers['claims'].append({'id': pub_id,
+                                          'number': claim['number'],
+                                          'depends_from': claim['depends-from'],
+                                          'text': claim_text(claim)})
+
+            for cite in record.get('backward_citations') or []:
+                writers['citations'].append({'id': pub_id,
+                                             'cited': cite['publication_number'],
+                                             'cited_country': cite['publication_number'][:2] or None,
+                                             'cited_by_examiner': cite['cited_by_examiner']})
+
+            for scheme, codes in (record.get('classifications') or {}).items():
+                for code in codes:
+                    if code:
+                        writers['classifications'].append({'id': pub_id, 'scheme': scheme, 'code': code})
+
+            count += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return count
+
+
+def load_table( directory, name, ids=None ):
+    ''' Memory-map the exported table <name>.  When <ids> is given, only rows for those publications are kept. '''
+    pa, pc, ipc = _require_pyarrow()
+    reader = ipc.open_file(pa.memory_map(os.path.join(directory, name + '.arrow'), 'r'))
+    if ids is None:
+        return reader.read_all()
+
+    value_set = ids if isinstance(ids, pa.Array) else pa.array(list(ids), pa.string())
+    batches = []
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        batches.append(batch.filter(pc.is_in(batch.column('id'), value_set=value_set)))
+    return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def _ids_with_classification( directory, prefix, scheme ):
+    ''' Ids of publications having a <scheme> code under <prefix>, matched as classification.prefix_range does (so
+        'H04L 9/1' and 'H04L9/1' are the same prefix).  The test runs on each batch's (small) dictionary, not on
+        every row. '''
+    pa, pc, ipc = _require_pyarrow()
+    bounds = prefix_range(prefix, scheme)
+    if bounds is None:
+        raise ValueError("Invalid classification prefix, '" + str(prefix) + "'.")
+    low, high = bounds
+    under = {}          # code -> whether it is under the prefix, shared by the batches' dictionaries
+
+    def is_under( code ):
+        if code not in under:
+            parsed = parse_code(code, scheme) if code else None
+            under[code] = parsed is not None and low <= parsed.key < high
+        return under[code]
+
+    reader = ipc.open_file(pa.memory_map(os.path.join(directory, 'classifications.arrow'), 'r'))
+    ids = []
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        scheme_column = batch.column('scheme')
+        code_column = batch.column('code')
+
+        matching_schemes = pc.indices_nonzero(pc.equal(scheme_column.dictionary, scheme))
+        matching_codes = pa.array([index for index, code in enumerate(code_column.dictionary.to_pylist())
+                                   if is_under(code)], pa.int64())
+        mask = pc.and_(pc.is_in(scheme_column.indices, value_set=matching_schemes.cast(pa.int32())),
+                       pc.is_in(code_column.indices, value_set=matching_codes.cast(pa.int32())))
+        ids.append(batch.column('id').filter(mask))
+
+    if not ids:
+        return pa.array([], pa.string())
+    return pc.unique(pa.chunked_array(ids, pa.string()).combine_chunks())
+
+
+def load_publications( directory, start=None, end=None, cpc_prefix=None, scheme='cooperative_classifications' ):
+    ''' Memory-map the publications table and keep only rows published in [<start>, <end>] (datetime.date or
+        'YYYY-MM-DD', either bound optional) and having a <scheme> code under <cpc_prefix> (e.g. 'H04L 9/'). '''
+    pa, pc, ipc = _require_pyarrow()
+    if isinstance(start, str): start = date.fromisoformat(start)
+    if isinstance(end, str): end = date.fromisoformat(end)
+
+    ids = None
+    if cpc_prefix:
+        ids = _ids_with_classification(directory, cpc_prefix, scheme)
+
+    reader = ipc.open_file(pa.memory_map(os.path.join(directory, 'publications.arrow'), 'r'))
+    batches = []
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        mask = None
+        published = batch.column('publication_date')
+        if start is not None:
+            mask = pc.greater_equal(published, pa.scalar(start, pa.date32()))
+        if end is not None:
+            upper = pc.less_equal(published, pa.scalar(end, pa.date32()))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if ids is not None:
+            wanted = pc.is_in(batch.column('id'), value_set=ids)
+            mask = wanted if mask is None else pc.and_(mask, wanted)
+
+        batches.append(batch if mask is None else batch.filter(pc.fill_null(mask, False)))
+
+    return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Export stored publications as Arrow IPC tables.')
+    parser.add_argument('--data', required=True, help='directory holding the publication store')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='directory',
+                        help="storage of --data: 'directory' (default) or 'sqlite' (then --data is the database file)")
+    parser.add_argument('--out', required=True, help='directory to write the .arrow files to')
+    args = parser.parse_args(argv)
+
+    count = export_arrow(PublicationStore(open_backend(args.backend, args.data)), args.out)
+    print('exported {0} publications to {1}'.format(count, args.out))
+
+
+if __name__ == "__main__":
+    main()
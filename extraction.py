@@ -0,0 +1,640 @@
+#!/usr/bin/env python
+""" Extraction - the shared scraping pipeline used by patentapi.GooglePatentPublication and patent_helper.GooglePatent
+
+fetch_html -          download a Google Patents page and decode it (once) into a str
+fetch_page -          the same, as a conditional request returning the status and response headers too
+make_soup -           parse a page into a BS4 object (pages over SOUP_SIZE_LIMIT are streamed, see skeleton_html)
+ExtractionPipeline -  an ordered set of named extractors that each fill part of a 'biblio' dict from the parsed page
+DEFAULT_PIPELINE -    bibliographic data, classifications, title, abstract, citations and claims
+BIBLIO_PIPELINE -     the same, without the (expensive) claims
+INDEPENDENT_CLAIMS_PIPELINE - the same, building only the independent claims
+claim_text -          the text of an extracted claim, flattened from its element tree
+"""
+
+import hashlib
+import re
+
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+
+import names
+from names import canonical_assignee, canonical_inventor
+
+# BeautifulSoup/lxml, htmlmin, urllib.request and zipfile are imported where they are used, so that importing this
+# module (and everything built on it) stays cheap for processes that never fetch or parse a page.
+
+GOOGLE_PATENTS_BASE_URL = 'https://www.google.com/patents/'
+FILEHISTORY_BASE_URL = 'http://storage.googleapis.com/uspto-pair/applications/'
+USER_AGENT = 'Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; WOW64; Trident/6.0; EIE10;ENUSMCM'
+
+# Identifies the output format of the extractors.  It changes whenever this file or a module the extractors call
+# does, so anything keyed on it (e.g. cache.ParsedCache) is invalidated automatically by a parser change.
+PARSER_SOURCES = (__file__, names.__file__)
+
+_digest = hashlib.sha1()
+for _path in PARSER_SOURCES:
+    with open(_path, 'rb') as _source:
+        _digest.update(_source.read())
+PARSER_VERSION = _digest.hexdigest()[:12]
+
+# Pages longer than this are neither minified nor parsed whole: they are streamed and only the sections the extractors
+# read are kept (see skeleton_html).  fetch_page counts bytes as they arrive, make_soup the characters of a page it is
+# given.  Huge pages are mostly descriptions and sequence listings, whose BS4 tree would otherwise take many times the
+# size of the page.  None turns streaming off.
+SOUP_SIZE_LIMIT = 4 * 1024 * 1024
+
+
+#-----------------------------------------------------------------------
+# Fetching
+#-----------------------------------------------------------------------
+def fetch_html( pub_num, base_url=GOOGLE_PATENTS_BASE_URL ):
+    ''' Fetch the Google Patents page for <pub_num> and return it as a minified str.
+        HTTPErrors are left to the caller. '''
+    status, headers, html, complete = fetch_page(pub_num, base_url)
+    return html
+
+
+def fetch_page( pub_num, base_url=GOOGLE_PATENTS_BASE_URL, etag=None, last_modified=None ):
+    ''' Fetch the Google Patents page for <pub_num>, optionally as a conditional request.
+        Returns (status, headers, html, complete).  When the server answers 304 Not Modified, html is None.
+        Pages longer than SOUP_SIZE_LIMIT bytes are streamed from the response into skeleton_html, so neither the
+        whole page nor its decoded text is ever held.  <complete> is False for such a reduced page, which must not be
+        cached as if it were the page itself.
+        Other HTTPErrors are left to the caller. '''
+    import htmlmin
+    from transport import get_transport
+
+    url = base_url + str(pub_num)
+
+    request_headers = {'User-Agent': USER_AGENT}
+    if etag:
+        request_headers['If-None-Match'] = etag
+    if last_modified:
+        request_headers['If-Modified-Since'] = last_modified
+
+    resp = get_transport().request(url, headers=request_headers, stream=True)
+    try:
+        if resp.status == 304:
+            return 304, resp.headers, None, True
+        resp.raise_for_status()
+
+        # Decode using the charset the server announced.  Parsing str(bytes) instead leaves escape sequences such as
+        # '\xe2\x80\x98' in the text.
+        charset = resp.headers.get_content_charset() or 'utf-8'
+        chunks = resp.chunks(STREAM_CHUNK_SIZE)
+        if SOUP_SIZE_LIMIT is None or not _longer_than(resp.headers.get('Content-Length'), SOUP_SIZE_LIMIT):
+            # Read up to the limit: without a Content-Length (or with a wrong one) the page may still be oversized
+            head, size = [], 0
+            for chunk in chunks:
+                head.append(chunk)
+                size += len(chunk)
+                if SOUP_SIZE_LIMIT is not None and size > SOUP_SIZE_LIMIT:
+                    break
+            else:
+                # The raw bytes are dropped as soon as they are decoded, so the raw, decoded and minified copies of the
+                # page are never all held at once
+                body = b''.join(head)
+                del head
+                html = body.decode(charset, errors='replace')
+                del body
+                return resp.status, resp.headers, htmlmin.minify(html), True
+            chunks = _chain_consumed(head, chunks)
+
+        html = skeleton_html(_decode_chunks(chunks, charset))
+        return resp.status, resp.headers, htmlmin.minify(html), False
+    finally:
+        resp.close()
+
+
+def _longer_than( content_length, limit ):
+    try: return int(content_length) > limit
+    except (TypeError, ValueError): return False
+
+
+def _chain_consumed( head, rest ):
+    ''' Yield the chunks in the list <head>, removing each as it goes, then those of <rest> '''
+    head.reverse()
+    while head:
+        yield head.pop()
+    yield from rest
+
+
+def _decode_chunks( chunks, charset ):
+    import codecs
+
+    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def make_soup( html, size_limit=None ):
+    ''' Parse a Google Patents page into a BS4 object.
+        Pages longer than <size_limit> characters (SOUP_SIZE_LIMIT by default) are reduced by skeleton_html first. '''
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    size_limit = SOUP_SIZE_LIMIT if size_limit is None else size_limit
+    if size_limit is not None and len(html) > size_limit:
+        html = skeleton_html(html)
+
+    strainer = SoupStrainer('html')
+    return BeautifulSoup(html, 'lxml', parse_only=strainer)
+
+
+# Elements the extractors read; everything else is dropped from oversized pages
+SKELETON_TAGS = ('meta', 'table', 'abstract')
+SKELETON_CLASSES = {'div': 'claims'}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def skeleton_html( html ):
+    ''' Stream <html> through lxml's pull parser, keeping only the elements the extractors read (meta tags, tables,
+        the abstract, the claims and the backward citations anchor) and discarding the rest of the tree as it goes.
+        <html> is a str, or an iterable of str chunks (e.g. a response decoded as it arrives).
+        Returns the kept elements, in page order, as a much smaller page. '''
+    from lxml import etree
+
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    parts = ['<html><body>']
+    keeping = None          # the kept element currently open, if any
+
+    def kept( element ):
+        tag = element.tag
+        if tag in SKELETON_TAGS:
+            return True
+        return tag in SKELETON_CLASSES and SKELETON_CLASSES[tag] in (element.get('class') or '').split()
+
+    if isinstance(html, str):
+        html = (html[offset:offset + STREAM_CHUNK_SIZE] for offset in range(0, len(html), STREAM_CHUNK_SIZE))
+
+    for chunk in html:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if not isinstance(element.tag, str):
+                continue                        # comments and processing instructions
+            if event == 'start':
+                if keeping is None and kept(element):
+                    keeping = element
+                continue
+
+            if keeping is not None and element is not keeping:
+                continue                        # inside a kept element; it is serialized whole at its end
+            if element is keeping:
+                parts.append(etree.tostring(element, method='html', encoding='unicode', with_tail=False))
+                keeping = None
+            elif element.tag == 'a' and element.get('id') == 'backward-citations':
+                # extract_backward_citations looks for the table following this anchor's parent
+                parts.append('<h2><a id="backward-citations"></a></h2>')
+
+            # Free what has been read so far
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+    parser.close()
+
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def file_history_url( application_number ):
+    ''' Return the URL of the USPTO PAIR zip for <application_number>, or None when it is not available '''
+    if not application_number:
+        return None
+
+    from zipfile import ZipFile
+    from httpfile import HttpFile
+
+    temp_appNum = str(application_number).replace(',', '')
+    temp_appNum = temp_appNum.replace('/', '')
+    url = FILEHISTORY_BASE_URL + temp_appNum + '.zip'
+
+    z = None
+    try: z = ZipFile(HttpFile(url))
+    except: pass
+
+    if z:
+        return url
+    return None
+
+
+#-----------------------------------------------------------------------
+# Pipeline
+#-----------------------------------------------------------------------
+class ExtractionPipeline ( object ):
+    """ An ordered collection of extractors.
+            Each extractor is a callable taking (soup, biblio) that adds its fields to the <biblio> dict.
+            The page is parsed once per run and every extractor shares the same BS4 object.
+    """
+
+    def __init__( self, extractors=None ):
+        self.extractors = OrderedDict(extractors or [])
+
+    def register( self, name, extractor ):
+        ''' Add (or replace) the extractor called <name> '''
+        self.extractors[name] = extractor
+
+    def unregister( self, name ):
+        self.extractors.pop(name, None)
+
+    def copy( self ):
+        return ExtractionPipeline(self.extractors.items())
+
+    def run( self, html ):
+        ''' Parse <html> and run every extractor over it, returning the biblio dict '''
+        return self.run_soup(make_soup(html))
+
+    def run_soup( self, soup, skip=() ):
+        ''' Run every extractor not named in <skip> over an already parsed page '''
+        biblio = {}
+        for name, extractor in self.extractors.items():
+            if name not in skip:
+                extractor(soup, biblio)
+        return biblio
+
+    def run_one( self, soup, name ):
+        ''' Run just the extractor called <name>, returning the fields it produced '''
+        biblio = {}
+        self.extractors[name](soup, biblio)
+        return biblio
+
+
+#-----------------------------------------------------------------------
+# Bibliographic data table
+#-----------------------------------------------------------------------
+MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+          'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+DATE_PATTERN = re.compile(r'^([A-Za-z]{3})[a-z]*\.?\s+(\d{1,2}),\s*(\d{4})$')
+
+@lru_cache(maxsize=8192)
+def parse_date( text ):
+    ''' Convert a Google Patents date ('%b %d, %Y', e.g. 'Mar 3, 2008') to 'YYYY-MM-DD'.
+        Returns None when <text> is not such a date.  Pages repeat the same few dates, so results are cached. '''
+    m = DATE_PATTERN.match(text.strip())
+    if not m:
+        return None
+
+    month = MONTHS.get(m.group(1).lower())
+    if not month:
+        return None
+
+    try: parsed = date(int(m.group(3)), month, int(m.group(2)))    # rejects e.g. Feb 30
+    except ValueError:
+        return None
+
+    return parsed.isoformat()
+
+
+# Each handler receives the text of the value cell next to the heading and fills in the biblio dict
+
+def _bibdata_publication_number( text, biblio ):
+    # Only the first "Publication number" row describes this publication
+    if biblio['kind_code']:
+        return
+
+    full_num = text                                 # should be of form "CCXXXXXXXKC"
+    kind_code = full_num[-2:].strip()               # kind_code is last
+    country = full_num[:2].strip()
+    publ_num = (full_num[2:-2]).strip()
+
+    biblio['id'] = country + publ_num + kind_code
+    biblio['publication_number'] = publ_num
+    biblio['kind_code'] = kind_code
+    biblio['country_code'] = country
+
+def _bibdata_application_number( text, biblio ):
+    app_num = text.strip()
+    biblio['application_number'] = app_num[2:len(app_num)].strip()
+
+def _bibdata_date( key ):
+    def handler( text, biblio ):
+        biblio[key] = parse_date(text)
+    return handler
+
+def _bibdata_family_members( text, biblio ):
+    biblio['family_members'] = text.strip().split(", ")
+
+def _bibdata_inventors( text, biblio ):
+    biblio['inventors'] = text.strip().split(', ')
+    biblio['inventors_canonical'] = [canonical_inventor(name) for name in biblio['inventors']]
+
+def _bibdata_assignee( text, biblio ):
+    biblio['assignee'] = text.strip()
+    biblio['assignee_canonical'] = canonical_assignee(biblio['assignee'])
+
+# Lower-cased heading text -> handler
+BIBDATA_HANDLERS = {'publication number': _bibdata_publication_number,
+                    'application number': _bibdata_application_number,
+                    'priority date': _bibdata_date('priority_date'),        # Google's calculated Priority Date
+                    'publication date': _bibdata_date('publication_date'),
+                    'filing date': _bibdata_date('filing_date'),
+                    'also published as': _bibdata_family_members,           # Publications related to the requested publication
+                    'inventors': _bibdata_inventors,
+                    'original assignee': _bibdata_assignee}
+
+def extract_bibdata( soup, biblio ):
+    ''' Read the <table class="patent-bibdata"> heading/value pairs '''
+    biblio['id'] = None
+    biblio['publication_number'] = None
+    biblio['kind_code'] = None
+    biblio['country_code'] = None
+    biblio['application_number'] = None
+    biblio['priority_date'] = None
+    biblio['publication_date'] = None
+    biblio['filing_date'] = None
+    biblio['family_members'] = []
+    biblio['inventors'] = []
+    biblio['inventors_canonical'] = []
+    biblio['assignee'] = None
+    biblio['assignee_canonical'] = None
+
+    # In the Google HTML, there is a <table> element with class="patent-bibdata". This table has most of the bibliographic
+    # data in table cells adjacent to cells with the data heading with class "patent-bibdata-heading".  We'll use BS4's
+    # 'next_sibling' method to get the data after finding the data heading
+    soupTable = soup.find("table", class_="patent-bibdata")
+    biblio_list = soupTable.find_all("td", class_="patent-bibdata-heading")
+
+    for item in biblio_list:
+        # The heading text is read once per cell and used to look up its handler; unknown headings are skipped
+        handler = BIBDATA_HANDLERS.get(item.getText().strip().lower())
+        if handler and item.next_sibling:
+            handler(item.next_sibling.getText(), biblio)
+
+
+#-----------------------------------------------------------------------
+# Classifications, title, abstract and citations
+#-----------------------------------------------------------------------
+# Heading text of each classification row -> key in the classifications dict
+CLASSIFICATION_HEADINGS = OrderedDict([('U.S. Classification', 'us_classifications'),
+                                       ('International Classification', 'international_classifications'),
+                                       ('Cooperative Classification', 'cooperative_classifications'),
+                                       ('European Classification', 'ep_classifications')])
+
+def extract_classifications( soup, biblio ):
+    ''' Read the US, IPC, CPC and ECLA classification rows in a single pass over the data table cells '''
+    classifications = OrderedDict((key, []) for key in CLASSIFICATION_HEADINGS.values())
+
+    for cell in soup.find_all('td', class_='patent-data-table-td'):
+        heading = cell.string
+        if not heading:
+            continue
+        for text, key in CLASSIFICATION_HEADINGS.items():
+            # only the first row for each heading is used
+            if (text in heading) and not classifications[key] and cell.next_sibling:
+                classifications[key] = [x.strip() for x in (cell.next_sibling.get_text()).split(',')]
+                break
+
+    biblio['classifications'] = dict(classifications)
+
+
+def extract_title( soup, biblio ):
+    biblio['title'] = None
+    try:
+        title_meta = soup.find('meta', attrs={'name': 'DC.title'})    # this is a bs4 Tag element
+        biblio['title'] = character_replace(title_meta['content'])
+    except: pass
+
+
+def extract_abstract( soup, biblio ):
+    biblio['abstract'] = None
+    try:
+        biblio['abstract'] = character_replace((soup.find('abstract').getText()).strip())
+    except: pass
+
+
+def extract_backward_citations( soup, biblio ):
+    biblio['backward_citations'] = []
+
+    backward_citation_table = None
+    try:
+        backward_citation_table = soup.find('a', {'id': 'backward-citations'}).parent.findNext('table')
+    except: pass
+
+    if backward_citation_table:
+        cite_numbers = backward_citation_table.findAll('td', class_="patent-data-table-td citation-patent")
+        for item in cite_numbers:
+            cite = process_citation(item.get_text())
+            if (cite['publication_number'] != ''):
+                biblio['backward_citations'].append(cite)
+
+
+def extract_claims( soup, biblio, independent_only=False ):
+    ''' Build every claim (or, with <independent_only>, only the independent ones) into biblio['claims'], and the
+        dependency structure of all claims into biblio['claim_graph'] (see build_claim_graph) '''
+    claims = []     # Initialize the claims array to an emtpy array
+    dependencies = []   # (number, depends-from) of every claim, built or not
+
+    # Google Patents keeps the claims deep within a div having a class="patent-claims-section"
+    # Within this div is a div that has a class="claims".  This is the only div in the page having class=claims
+    # Using BS4, we can extract this div by searching on class_="claims".
+    soupClaimsContainer = soup.find('div', class_="claims")
+    if not soupClaimsContainer:
+        biblio['claims'] = claims
+        biblio['claim_graph'] = build_claim_graph(dependencies)
+        return
+
+    # The soupClaimsContainer contains DIV elements that represent each claim.
+    # Each claim has a class that is either "claim" (for independent claims) or "claim-dependent" (for dependent claims)
+    soupClaimsList = soupClaimsContainer.find_all('div', recursive=False)
+
+    # Each claim will comprise NavigableStrings and other Tag elements (mostly DIVs containing other DIVs or NavigableStrings)
+    # The <div class="claim [claim-dependent]"> container will contain a single DIV with id=:CLM-XXXXX", num="XXXXX", class="claim"
+    # This is the outer-most container of the individual claim information.
+    for iClaim in soupClaimsList:
+        claim = {'depends-from': None}      # initially, we set the "depends-from" property to None to default to an
+                                            # independent claim
+
+        # claimContainer will be the DIV with id, num and class attributes
+        # set recursive=False because we only want the top level DIVs
+        claimContainer = iClaim.find('div', recursive=False)
+
+        # Add the 'number' property to the claim object  Number identifies the claim by number
+        claim['number'] = int(claimContainer['num'])
+
+        if independent_only:
+            # Finding the <claim-ref> is enough to tell a dependent claim; its element tree is never built
+            claimref = claimContainer.find('claim-ref')
+            if claimref:
+                dependencies.append((claim['number'], int(claimref['idref'].split('-')[1])))
+                continue
+
+        # claimElementContainersList will be a list of DIV elements that contain the text of the claim
+        claimElementContainersList = claimContainer.find_all('div', recursive=False)
+        # BuildClaim will create the JSON structure for each claim
+        BuildClaim(claimElementContainersList, claim)
+
+        dependencies.append((claim['number'], claim['depends-from']))
+        claims.append(claim)
+
+    biblio['claims'] = claims
+    biblio['claim_graph'] = build_claim_graph(dependencies)
+
+
+def extract_independent_claims( soup, biblio ):
+    extract_claims(soup, biblio, independent_only=True)
+
+
+BIBLIO_EXTRACTORS = [('bibdata', extract_bibdata),
+                     ('title', extract_title),
+                     ('abstract', extract_abstract),
+                     ('backward_citations', extract_backward_citations),
+                     ('classifications', extract_classifications)]
+
+BIBLIO_PIPELINE = ExtractionPipeline(BIBLIO_EXTRACTORS)
+DEFAULT_PIPELINE = ExtractionPipeline(BIBLIO_EXTRACTORS + [('claims', extract_claims)])
+INDEPENDENT_CLAIMS_PIPELINE = ExtractionPipeline(BIBLIO_EXTRACTORS + [('claims', extract_independent_claims)])
+
+
+#-----------------------------------------------------------------------
+# Claims
+#-----------------------------------------------------------------------
+def BuildClaim(containerList, claim):
+    ''' Analyze the claim information returned from Google Patents and transform it into a JSON representation.'''
+
+    # Initialize an array to hold the claim elements
+    claim_elements = []
+    # containerList was passed in as a parameter and holds a list of DIV elements that contain element text and
+    # other DIVs comprising sub-elements.
+    # We loop through the list and determine if this is a dependent or independent claim
+    for container in containerList:
+        #look for a <claim-ref> tag.  If it exists, this is a dependent claim, so we will
+        # set claim['depends-from'] = to the clim's parent number, which can be derived from the claim-ref tag's
+        # idref attribute
+        claimref = container.find('claim-ref')
+        if claimref:
+            # idref is in the form CLM-XXXXX.  We split that string and select only the numerical portion.
+            # don't forget to cast the number to an INTEGER
+            claim['depends-from'] = int(claimref['idref'].split('-')[1])
+
+        # TODO: There are tags that will appear in some patent claims and not others (e.g., <CHEMISTRY>.
+        # Need to add support for these as they arise.
+
+        # Now pass the container to the BuildClaimElement function, which returns a JSON object representing the
+        # claim element.  Then, append that claim element to the claim_elements list
+        claim_elements.append(BuildClaimElement(container))
+
+    # after all the container items have been processed, the claim_elements list should contain a JSON object representing
+    # all of the elements in the claim.  We then add that object to the 'elements' property of the claim object.
+    claim['elements'] = claim_elements
+    return
+
+
+def BuildClaimElement(container):
+    ''' Build an element of the JSON claim structure. '''
+    element = {}                                                    #initialize the element object
+    element_text = ''                                               #initialize the element's text
+    element_children = container.find_all('div', recursive=False)   #find all child elements, if any
+
+    # interate through all the contents of the bSoup container to build the text of the claim element
+    for child in container.children:
+        # if the child element is a NavigableString, it's part of the text for the claim element
+        # otherwise, it's probably a child element
+        if (child.string and (not child.name == 'div')):
+            element_text += child.string
+
+    # Once the element text is built, add it to the 'text' property of the element object
+    element['text'] = (strip_claim_number(element_text.strip())).strip()
+
+    element['children'] = []        # child elements will be stored in an array of element objects, so init the children property
+
+    # Now loop through the child elements we found above and call this function recursively to build the child elements
+    for elem in element_children:
+        element['children'].append(BuildClaimElement(elem))
+
+    return element
+
+
+def claim_text( claim ):
+    ''' The text of <claim> (a claim dict with an 'elements' tree from BuildClaimElement), depth first '''
+    parts = []
+    pending = list(reversed(claim.get('elements') or []))
+    while pending:
+        element = pending.pop()
+        parts.append(element.get('text') or '')
+        pending.extend(reversed(element.get('children') or []))
+    return ' '.join(part for part in parts if part)
+
+
+def build_claim_graph( dependencies ):
+    ''' Precompute the claim dependency structure from (number, depends-from) pairs in claim order.
+        Returns parallel lists indexed like 'numbers':
+            numbers -  claim numbers
+            parents -  the claim each one depends from (None for independent claims)
+            children - the claims depending directly on each one
+            depth -    0 for independent claims, 1 for claims depending on them, ...
+        and 'roots', the independent claims.  A reference to a claim that isn't on the page makes a root. '''
+    numbers = [number for number, parent in dependencies]
+    parents = [parent for number, parent in dependencies]
+    position = {number: i for i, number in enumerate(numbers)}
+
+    children = [[] for number in numbers]
+    for number, parent in dependencies:
+        if parent in position:
+            children[position[parent]].append(number)
+
+    depth = [None] * len(numbers)
+    for i in range(len(numbers)):
+        # walk up to the first claim whose depth is known (or a root), then fill in the depths on the way back
+        chain = []
+        j = i
+        while j is not None and depth[j] is None and j not in chain:
+            chain.append(j)
+            j = position.get(parents[j])
+        known = -1 if j is None or depth[j] is None else depth[j]
+        for k in reversed(chain):
+            known += 1
+            depth[k] = known
+
+    roots = [number for number, parent in dependencies if parent not in position]
+    return {'numbers': numbers, 'parents': parents, 'children': children, 'depth': depth, 'roots': roots}
+
+
+CLAIM_NUMBER_PATTERN = re.compile(r'^\d{0,3}\.\s{1,5}')
+
+def strip_claim_number(text):
+    return CLAIM_NUMBER_PATTERN.sub('', text)
+
+
+#-----------------------------------------------------------------------
+# Helpers
+#-----------------------------------------------------------------------
+PUBLICATION_PATTERN = re.compile(r"(?P<cc>[A-Za-z]{2})(?P<pub>[0-9]{1,12})(?P<kc>[A-Za-z]?[1-9]?)") # Regular Expression to match Google Patent's
+
+def validate_publication( publication_number ):
+
+    # Strip leading/trailing whitespace and remove specific characters that may be passed in.
+    # The goal is to have only form CC[XXXXXXXXXX]XKC
+    publication_number = re.sub('[^0-9a-zA-Z]+', '', str(publication_number or ''))
+
+    m = PUBLICATION_PATTERN.match(publication_number)
+    if m:
+        return publication_number
+
+    return False
+
+# Now that pages are decoded properly, this only has to normalize typographic quotes and drop line breaks.
+# Add entities as they are discovered.
+CHARACTER_REPLACEMENTS = [("‘", "'"),
+                          ("’", "'"),
+                          ("\n", "")]
+
+def character_replace( strng ):
+    for old, new in CHARACTER_REPLACEMENTS:
+        strng = strng.replace(old, new)
+
+    return strng
+
+def process_citation( strng ):
+    cite = {}
+    if "*" not in strng:
+        cite = {'publication_number': strng.strip(),
+                'cited_by_examiner': False}
+    else:
+        strng = strng.replace('*','')
+        cite = {'publication_number': strng.strip(),
+                'cited_by_examiner': True}
+    return cite
@@ -1,11 +1,20 @@
+import os
 import re
+import threading
+from contextlib import nullcontext
 from urllib.error import HTTPError
 from flask import Flask, jsonify, make_response, request, current_app
 from datetime import datetime, timedelta
-from functools import update_wrapper
+from functools import partial, update_wrapper
 
-from patent_helper import GooglePatent
-from patentapi import GooglePatentPublication
+from patentapi import load_publication
+import extraction
+from extraction import validate_publication
+from memprofile import MemoryProfile, stage
+from similarity import SimilarityIndex, CLAIMS, KINDS
+from prefetch import Prefetcher
+from backends import open_backend
+from cache import HtmlCache, ParsedCache
 
 from flask import request, render_template
 
@@ -54,6 +63,61 @@ def crossdomain(origin=None, methods=None, headers=None,
 
 app = Flask(__name__)
 
+# Page and parse-result caches, enabled by pointing PATENTAPI_CACHE_DIR at a writable directory.
+# PATENTAPI_CACHE_BACKEND is 'directory' (one file per entry) or 'sqlite' (a single WAL-mode database in that
+# directory); either one is shared by all worker processes, and only one worker fetches a given publication at a time.
+app.config['CACHE_DIR'] = os.environ.get('PATENTAPI_CACHE_DIR')
+app.config['CACHE_BACKEND'] = os.environ.get('PATENTAPI_CACHE_BACKEND', 'directory')
+html_cache = None
+parsed_cache = None
+if app.config['CACHE_DIR']:
+    if app.config['CACHE_BACKEND'] == 'sqlite':
+        cache_backend = open_backend('sqlite', os.path.join(app.config['CACHE_DIR'], 'cache.sqlite3'))
+    else:
+        cache_backend = open_backend(app.config['CACHE_BACKEND'], app.config['CACHE_DIR'])
+    html_cache = HtmlCache(cache_backend)
+    parsed_cache = ParsedCache(cache_backend)
+
+# Pages longer than PATENTAPI_SOUP_SIZE_LIMIT bytes are streamed, keeping only the parts that are extracted
+if os.environ.get('PATENTAPI_SOUP_SIZE_LIMIT'):
+    extraction.SOUP_SIZE_LIMIT = int(os.environ['PATENTAPI_SOUP_SIZE_LIMIT'])
+
+# PATENTAPI_MEMORY_PROFILE=1 adds the memory used by each stage of the request to the response ('memory_profile')
+app.config['MEMORY_PROFILE'] = os.environ.get('PATENTAPI_MEMORY_PROFILE') == '1'
+
+# Similarity queries use the index written by `python similarity.py --out ...`, loaded on the first query
+app.config['SIMILARITY_INDEX'] = os.environ.get('PATENTAPI_SIMILARITY_INDEX')
+similarity_index = None
+similarity_lock = threading.Lock()
+
+PUBLICATION_REGEX = re.compile('US[\d]{1,15}', re.IGNORECASE)
+
+# Background prefetch of the family members and citations of served publications (only useful with the caches).
+# PATENTAPI_PREFETCH_BUDGET is the most publications prefetched per minute by each worker process, so N workers
+# prefetch up to N times that; 0 turns prefetching off.  A worker only pauses for its own foreground requests.
+app.config['PREFETCH_BUDGET'] = int(os.environ.get('PATENTAPI_PREFETCH_BUDGET', '30'))
+app.config['PREFETCH_PER_PUBLICATION'] = int(os.environ.get('PATENTAPI_PREFETCH_PER_PUBLICATION', '10'))
+prefetcher = None
+prefetcher_pid = None
+prefetcher_lock = threading.Lock()
+
+def get_prefetcher():
+    # Started on the first request rather than at import, so a server that imports the app and then forks its
+    # workers gets a prefetch thread in each worker (threads don't survive a fork) instead of one in the parent
+    global prefetcher, prefetcher_pid
+    if not parsed_cache or app.config['PREFETCH_BUDGET'] <= 0:
+        return None
+    with prefetcher_lock:
+        if prefetcher_pid != os.getpid():
+            prefetcher = Prefetcher(partial(load_publication, html_cache=html_cache, parsed_cache=parsed_cache),
+                                    is_cached=lambda pub_num: validate_publication(pub_num) in parsed_cache,
+                                    accept=PUBLICATION_REGEX.match,
+                                    budget=app.config['PREFETCH_BUDGET'],
+                                    per_publication=app.config['PREFETCH_PER_PUBLICATION'])
+            prefetcher.start()
+            prefetcher_pid = os.getpid()
+        return prefetcher
+
 @app.route('/')
 def index():
     #return 'Running Patent API Server v.0.0.1!'
@@ -85,14 +149,69 @@ def get_publication(pub_num):
     #print('\n\n' + pub_num + '\n\n')
     #print('API WAS ACCESSED AT ' + str(datetime.now()))
 
-    regex = re.compile('US[\d]{1,15}', re.IGNORECASE)
-    if regex.match(pub_num):
+    if PUBLICATION_REGEX.match(pub_num):
+
+        try:
+            prefetcher = get_prefetcher()
+            with (prefetcher.foreground() if prefetcher else nullcontext()):
+                # ?claims=independent returns only the independent claims, without building the dependent ones
+                # ?claims=none leaves the claims out of the response.  Without a parsed cache they are then never
+                # extracted; with one, a cache miss still extracts them, since the cached result must be complete.
+                claims = request.args.get('claims')
+                profile = MemoryProfile() if app.config['MEMORY_PROFILE'] else None
+                with (profile or nullcontext()):
+                    pat = load_publication(pub_num, html_cache=html_cache, parsed_cache=parsed_cache,
+                                           independent_claims=(claims == 'independent'), profile=profile)
+
+                    with stage(profile, 'serialize'):
+                        pat_dict = pat.to_dict(exclude=('claims', 'claim_graph') if claims == 'none' else ())
+
+            if prefetcher:
+                prefetcher.enqueue_related(pat_dict)
+
+            if profile:
+                pat_dict['memory_profile'] = profile.stages
+            pat_dict['message'] = 'OK'
+            pat_dict['status'] = 200
+            return jsonify(pat_dict)
+        except Exception as err:
+            #raise err
+            pass
+            return not_found(pub_num)
+
+    return not_found(pub_num)
+
+def get_similarity_index():
+    global similarity_index
+    with similarity_lock:
+        if similarity_index is None:
+            similarity_index = SimilarityIndex.load(app.config['SIMILARITY_INDEX'])
+        return similarity_index
+
+@app.route('/api/test/similar/<string:pub_num>', methods=['GET', 'OPTIONS'])
+@crossdomain(origin='*')
+def get_similar(pub_num):
+    # Indexed publications whose independent claims (?kind=claims, the default), abstract (?kind=abstract) or either
+    # (?kind=all) are at least ?threshold= similar (default 0.8) to those of <pub_num>, best first (at most ?limit=)
+
+    if PUBLICATION_REGEX.match(pub_num) and app.config['SIMILARITY_INDEX']:
 
         try:
-            pat = GooglePatentPublication(pub_num)
-            pat.dict['message'] = 'OK'
-            pat.dict['status'] = 200
-            return jsonify(pat.dict)
+            kind = request.args.get('kind', CLAIMS)
+            threshold = float(request.args.get('threshold', '0.8'))
+            limit = int(request.args.get('limit', '100'))
+            if kind != 'all' and kind not in KINDS:
+                return not_found(pub_num)
+
+            prefetcher = get_prefetcher()
+            with (prefetcher.foreground() if prefetcher else nullcontext()):
+                pat = load_publication(pub_num, html_cache=html_cache, parsed_cache=parsed_cache,
+                                       independent_claims=True)
+                similar = get_similarity_index().query(pat.to_dict(exclude=('backward_citations', 'classifications')),
+                                                       threshold=threshold, kind=None if kind == 'all' else kind,
+                                                       limit=limit)
+
+            return jsonify({'id': pat.id, 'similar': similar, 'message': 'OK', 'status': 200})
         except Exception as err:
             #raise err
             pass
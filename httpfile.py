@@ -1,31 +1,71 @@
-import urllib.request
+import re
+
+from transport import get_transport
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)$')
 
 class HttpFile(object):
-    def __init__(self, url):
+    # Reads are served from a read-ahead buffer of at least block_size bytes, so the many small reads ZipFile makes
+    # (end record, central directory, local headers) turn into a handful of Range requests.
+    def __init__(self, url, block_size=64 * 1024):
         self.url = url
         self.offset = 0
         self._size = -1
+        self.block_size = block_size
+        self._buffer = b''
+        self._buffer_start = 0
+        self.requests = 0
 
     def size(self):
         if self._size < 0:
-            f = urllib.request.urlopen(self.url)
+            f = get_transport().request(self.url, method='HEAD')
+            self.requests += 1
+            f.raise_for_status()
             self._size = int(f.headers["Content-length"])
         return self._size
 
+    def _fetch(self, start, end):
+        f = get_transport().request(self.url, headers={'Range': "bytes=%s-%s" % (start, end)})
+        self.requests += 1
+        f.raise_for_status()
+
+        # A server that ignores the Range header answers 200 with the whole file, and a mismatched range would
+        # silently corrupt the buffer, so both are errors rather than data
+        content_range = f.headers.get('Content-Range') or ''
+        match = CONTENT_RANGE_PATTERN.match(content_range)
+        if f.status != 206 or not match:
+            raise IOError('Range request for bytes %s-%s of %s was answered with %s %s'
+                          % (start, end, self.url, f.status, content_range or 'no Content-Range'))
+        first, last, total = match.groups()
+        if int(first) != start or len(f.body) != int(last) - int(first) + 1:
+            raise IOError('Range request for bytes %s-%s of %s returned %s (%s bytes)'
+                          % (start, end, self.url, content_range, len(f.body)))
+
+        # A ranged response carries the full size ("bytes 0-99/12345"), which saves the HEAD request
+        if self._size < 0 and total != '*':
+            self._size = int(total)
+        return f.body
+
     def read(self, count=-1):
-        req = urllib.request.Request(self.url)
         if count < 0:
-            end = self.size() - 1
-        else:
-            end = self.offset + count - 1
-        req.headers['Range'] = "bytes=%s-%s" % (self.offset, end)
-        f = urllib.request.urlopen(req)
-        data = f.read()
-        # FIXME: should check that we got the range expected, etc.
-        chunk = len(data)
-        if count >= 0:
-            assert chunk == count
-        self.offset += chunk
+            count = self.size() - self.offset
+        if count <= 0 or (self._size >= 0 and self.offset >= self._size):
+            return b''
+
+        buffer_end = self._buffer_start + len(self._buffer)
+        if not (self._buffer_start <= self.offset and self.offset + count <= buffer_end):
+            start = self.offset
+            end = self.offset + max(count, self.block_size) - 1
+            if self._size >= 0 and end >= self._size:
+                # Near the end of the file (where the zip central directory lives) read a whole block backwards
+                end = self._size - 1
+                start = max(0, min(self.offset, self._size - self.block_size))
+            self._buffer = self._fetch(start, end)
+            self._buffer_start = start
+
+        start = self.offset - self._buffer_start
+        data = self._buffer[start:start + count]
+        self.offset += len(data)
         return data
 
     def seek(self, offset, whence=0):
@@ -37,6 +77,10 @@ class HttpFile(object):
             self.offset = self.size() + offset
         else:
             raise Exception("Invalid whence")
+        return self.offset
+
+    def seekable(self):
+        return True
 
     def tell(self):
-        return self.offset
\ No newline at end of file
+        return self.offset
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+""" Indexfile - the file format shared by the classification, name and similarity indexes
+
+write_index - a JSON header line followed by the raw contents of some arrays
+read_index -  read such a file back as the header and a list of array.array
+
+Arrays are written as they are in memory, so a file can only be read where the item sizes and byte order are the same.
+Both are recorded on the header line and checked by read_index.
+"""
+
+import json
+import sys
+from array import array
+
+
+def write_index( path, header, arrays ):
+    ''' Write <header> (any JSON value) and <arrays> to <path>.
+        Each array is an array.array or another C-contiguous buffer, such as a numpy array (written flattened). '''
+    views = [memoryview(values) for values in arrays]
+    layout = {'header': header,
+              'byteorder': sys.byteorder,
+              'arrays': [[view.format, view.itemsize, view.nbytes // view.itemsize] for view in views]}
+    with open(path, 'wb') as f:
+        f.write(json.dumps(layout).encode('utf-8') + b'\n')
+        for view in views:
+            f.write(view.cast('B'))
+
+
+def read_index( path, name ):
+    ''' Return (header, arrays) from a file written by write_index, each array as an array.array.
+        Raises ValueError, naming the index as <name>, for a file written in another format or on a platform with
+        other item sizes or byte order. '''
+    with open(path, 'rb') as f:
+        layout = json.loads(f.readline().decode('utf-8'))
+        if not isinstance(layout, dict) or 'arrays' not in layout:
+            raise ValueError(name + ' was written in an older format, rebuild it: ' + path)
+        if layout['byteorder'] != sys.byteorder or \
+                any(array(typecode).itemsize != itemsize for typecode, itemsize, length in layout['arrays']):
+            raise ValueError(name + ' was written on an incompatible platform: ' + path)
+
+        arrays = []
+        for typecode, itemsize, length in layout['arrays']:
+            values = array(typecode)
+            values.fromfile(f, length)
+            arrays.append(values)
+    return layout['header'], arrays
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+""" Memprofile - optional per-stage memory reporting for a single request, using tracemalloc
+
+    with MemoryProfile() as profile:
+        pat = load_publication('US8123456', profile=profile)
+        with stage(profile, 'serialize'):
+            pat.to_dict()
+    print(profile.report())
+
+Each stage records the memory it left allocated and its peak, relative to the start of the stage, plus the total
+still allocated since the profile started.  tracemalloc traces the whole process, so the figures are only exact
+when a single request is running.  Tracing stays on until the last running profile stops, and a stage that overlapped
+a stage in another thread reports its peak as None, since the two peaks can't be told apart.  Stages may nest within
+a thread (e.g. a lazy extraction inside 'serialize'); the outer stage's peak then covers the inner one.
+
+MemoryProfile - starts and stops tracing, and collects the stages
+stage -         profile.stage(name), or a no-op when profile is None
+"""
+
+import threading
+from contextlib import contextmanager, nullcontext
+
+# Tracing is shared by every profile in the process: it is started by the first one and stopped with the last
+_lock = threading.Lock()
+_profiles = 0               # profiles running
+_owned = False              # whether tracing was started here (rather than with python -X tracemalloc)
+_stages = 0                 # stages running, across all threads
+_stage_starts = 0           # stages started so far, across all threads
+_local = threading.local()  # per thread: 'stack' of running stages, 'starts' of stages started in this thread
+
+
+class MemoryProfile ( object ):
+
+    def __init__( self ):
+        self.stages = []
+        self.__running = False
+        self.__baseline = 0
+
+    def start( self ):
+        global _profiles, _owned
+        import tracemalloc
+
+        with _lock:
+            if not self.__running:
+                if not _profiles:
+                    # Tracing that was already on (e.g. python -X tracemalloc) is left running
+                    _owned = not tracemalloc.is_tracing()
+                    if _owned:
+                        tracemalloc.start()
+                _profiles += 1
+                self.__running = True
+            self.__baseline = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def stop( self ):
+        global _profiles, _owned
+        import tracemalloc
+
+        with _lock:
+            if self.__running:
+                self.__running = False
+                _profiles -= 1
+                if not _profiles and _owned:
+                    tracemalloc.stop()
+                    _owned = False
+
+    def __enter__( self ):
+        return self.start()
+
+    def __exit__( self, *exc_info ):
+        self.stop()
+
+    @contextmanager
+    def stage( self, name ):
+        global _stages, _stage_starts
+        import tracemalloc
+
+        if not self.__running or not tracemalloc.is_tracing():
+            yield
+            return
+
+        stack = _local.__dict__.setdefault('stack', [])
+        frame = {'peak': 0}
+        with _lock:
+            # Stages started by other threads, so far
+            others = _stage_starts - _local.__dict__.get('starts', 0)
+            overlapped = _stages > len(stack)
+            _stages += 1
+            _stage_starts += 1
+            _local.starts = _local.__dict__.get('starts', 0) + 1
+
+            before, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)    # the enclosing stage's peak so far
+            if not overlapped:
+                tracemalloc.reset_peak()        # process-wide, so only when no other thread is measuring a peak
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            with _lock:
+                _stages -= 1
+                overlapped = overlapped or _stage_starts - _local.starts != others
+                current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            self.stages.append({'stage': name,
+                                'allocated': current - before,
+                                'peak': None if overlapped else max(peak, frame['peak']) - before,
+                                'retained': current - self.__baseline})
+
+    def report( self ):
+        ''' The stages as text, one line each, in KiB '''
+        lines = ['{0:<24} {1:>12} {2:>12} {3:>12}'.format('stage', 'allocated', 'peak', 'retained')]
+        for s in self.stages:
+            peak = '-' if s['peak'] is None else '{0:.1f}'.format(s['peak'] / 1024.0)
+            lines.append('{0:<24} {1:>12.1f} {2:>12} {3:>12.1f}'.format(
+                s['stage'], s['allocated'] / 1024.0, peak, s['retained'] / 1024.0))
+        return '\n'.join(lines)
+
+
+def stage( profile, name ):
+    ''' Record stage <name> in <profile>, if there is one '''
+    return profile.stage(name) if profile is not None else nullcontext()
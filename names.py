@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+""" Names - canonical assignee and inventor names, and a portfolio index over stored publications
+
+canonical_assignee -  'International Business Machines Corp.' -> 'INTERNATIONAL BUSINESS MACHINES'
+                      'Kabushiki Kaisha Toshiba' and 'Toshiba Corp' -> 'TOSHIBA'
+canonical_inventor -  'Smith, John A., Jr.' and 'John Smith' -> 'JOHN SMITH'; 'J. Smith' -> 'J SMITH'
+NameTable -           interned canonical names with integer ids, plus an alias index from every spelling seen
+NameIndex -           assignee and inventor name ids per publication, with precomputed portfolio counts
+build_index -         a NameIndex over every publication in a store
+
+Canonical names are added to the publication dict at extraction time ('assignee_canonical', 'inventors_canonical'),
+so spelling variants are already grouped when a record is stored.  Variants the rules can't merge (e.g. 'IBM') are
+mapped with explicit alias tables, one per kind of name: {'assignee': {variant: name it stands for},
+'inventors': {...}}.
+
+    python names.py --data DIR [--backend sqlite] [--aliases aliases.json] [--top 20] [--assignee NAME]
+"""
+
+import argparse
+import json
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from backends import BACKENDS, open_backend
+from indexfile import read_index, write_index
+from store import PublicationStore
+
+# Legal forms dropped from the end of assignee names, as folded by _fold
+ASSIGNEE_SUFFIXES = ['INC', 'INCORPORATED', 'CORP', 'CORPORATION', 'CO', 'COMPANY', 'LTD', 'LIMITED',
+                     'LLC', 'L L C', 'LLP', 'LP', 'L P', 'PLC', 'GMBH', 'GESELLSCHAFT MIT BESCHRANKTER HAFTUNG',
+                     'AG', 'AKTIENGESELLSCHAFT', 'KG', 'GMBH AND CO KG', 'SA', 'S A', 'NV', 'N V', 'BV', 'B V', 'AB',
+                     'OY', 'OYJ', 'SPA', 'S P A', 'SRL', 'KK', 'KABUSHIKI KAISHA', 'CO LTD', 'SAS', 'SE', 'PTY', 'PTE']
+# Legal forms (and articles) dropped from the start of assignee names
+ASSIGNEE_PREFIXES = ['THE', 'KABUSHIKI KAISHA', 'KABUSHIKIKAISHA']
+
+# As word tuples, longest first so multi-word forms match whole
+_SUFFIX_WORDS = sorted((tuple(s.split()) for s in ASSIGNEE_SUFFIXES), key=len, reverse=True)
+_PREFIX_WORDS = sorted((tuple(s.split()) for s in ASSIGNEE_PREFIXES), key=len, reverse=True)
+_LEGAL_FORMS = set(_SUFFIX_WORDS + _PREFIX_WORDS)
+
+# Generational suffixes dropped from inventor names
+INVENTOR_SUFFIXES = {'JR', 'SR', 'II', 'III', 'IV'}
+
+NON_WORD_PATTERN = re.compile(r'[^A-Z0-9]+')
+
+
+def _fold( name ):
+    ''' Upper case ASCII words: accents removed, '&' spelled out, punctuation dropped '''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').upper()
+    name = name.replace('&', ' AND ')
+    return NON_WORD_PATTERN.sub(' ', name.replace('.', '')).strip()
+
+
+def _keeps_name( rest ):
+    # Stripping a legal form must leave a name, not nothing or just another legal form ('CO CO INC' -> 'CO CO')
+    return bool(rest) and tuple(rest) not in _LEGAL_FORMS
+
+
+def _strip_legal_forms( words ):
+    ''' Drop the run of legal forms at the end of <words>, then one at the start '''
+    stripped = True
+    while stripped:
+        stripped = False
+        for form in _SUFFIX_WORDS:
+            rest = words[:-len(form)]
+            if tuple(words[-len(form):]) == form and _keeps_name(rest):
+                words, stripped = rest, True
+                break
+
+    for form in _PREFIX_WORDS:
+        rest = words[len(form):]
+        if tuple(words[:len(form)]) == form and _keeps_name(rest):
+            return rest
+    return words
+
+
+@lru_cache(maxsize=65536)
+def canonical_assignee( name ):
+    ''' Canonical form of an assignee name (None for an empty name) '''
+    if not name:
+        return None
+    words = _fold(name).split()
+    return ' '.join(_strip_legal_forms(words)) or None
+
+
+@lru_cache(maxsize=65536)
+def canonical_inventor( name ):
+    ''' Canonical form of an inventor name: given names then family name, without generational suffixes.
+        'Family, Given' is reordered.  Initials are dropped when there is a full given name ('John A. Smith' ->
+        'JOHN SMITH') and kept otherwise ('J. Smith' -> 'J SMITH'), so initial-only names don't merge.
+        None for an empty name. '''
+    if not name:
+        return None
+    if ',' in name:
+        parts = [part.strip() for part in name.split(',')]
+        family, given = parts[0], ' '.join(part for part in parts[1:] if _fold(part) not in INVENTOR_SUFFIXES)
+        name = given + ' ' + family
+    words = [word for word in _fold(name).split() if word not in INVENTOR_SUFFIXES]
+    if any(len(word) > 1 for word in words[:-1]):
+        words = [word for word in words[:-1] if len(word) > 1] + words[-1:]
+    return ' '.join(words) or _fold(name) or None
+
+
+class NameTable ( object ):
+    """ Interned canonical names.
+            names[id] is the canonical name; ids maps it back.  aliases maps every spelling added straight to an id,
+            so repeated spellings skip canonicalization.  Explicit <aliases> ({variant: name}) are applied on top of
+            the canonicalization rules.
+    """
+
+    def __init__( self, canonicalize, aliases=None ):
+        self.canonicalize = canonicalize
+        self.names = []
+        self.ids = {}
+        self.aliases = {}
+        self.__explicit = {}        # canonical variant -> canonical name, from the alias table
+
+        for variant, name in (aliases or {}).items():
+            self.__explicit[canonicalize(variant)] = canonicalize(name)
+
+    def __canonical( self, name ):
+        canonical = self.canonicalize(name)
+        return self.__explicit.get(canonical, canonical)
+
+    def intern( self, name, canonical=None ):
+        ''' The id of <name>'s canonical form, adding it if it is new (None for an empty name).
+            <canonical> is the form already computed at extraction time, if there is one. '''
+        name_id = self.aliases.get(name)
+        if name_id is not None:
+            return name_id
+
+        if canonical is not None:
+            canonical = self.__explicit.get(canonical, canonical)
+        else:
+            canonical = self.__canonical(name)
+        if canonical is None:
+            return None
+        name_id = self.ids.get(canonical)
+        if name_id is None:
+            name_id = self.ids[canonical] = len(self.names)
+            self.names.append(canonical)
+        self.aliases[name] = name_id
+        return name_id
+
+    def lookup( self, name ):
+        ''' The id of <name>'s canonical form, or None if it isn't in the table '''
+        name_id = self.aliases.get(name)
+        if name_id is None:
+            name_id = self.ids.get(self.__canonical(name))
+        return name_id
+
+    def variants( self, name ):
+        ''' Every spelling seen for the canonical name of <name> '''
+        name_id = self.lookup(name)
+        return sorted(alias for alias, alias_id in self.aliases.items() if alias_id == name_id)
+
+    def to_json( self ):
+        return {'names': self.names, 'aliases': self.aliases, 'explicit': self.__explicit}
+
+    def from_json( self, data ):
+        self.names = data['names']
+        self.ids = {name: name_id for name_id, name in enumerate(self.names)}
+        self.aliases = data['aliases']
+        self.__explicit = data['explicit']
+        return self
+
+
+class NameIndex ( object ):
+    """ Assignee and inventor name ids of a set of publications.
+            For each kind of name, (name id, publication ordinal) pairs are held as sorted parallel arrays, so a
+            portfolio is two binary searches and a slice, and counts per name id are precomputed.
+    """
+
+    KINDS = ('assignee', 'inventors')
+
+    def __init__( self, aliases=None ):
+        aliases = aliases or {}
+        self.ids = []            # ordinal -> publication id
+        self.tables = {'assignee': NameTable(canonical_assignee, aliases.get('assignee')),
+                       'inventors': NameTable(canonical_inventor, aliases.get('inventors'))}
+        self.keys = {}           # kind -> array('l') of sorted name ids
+        self.postings = {}       # kind -> array('l') of publication ordinals, parallel to keys
+        self.counts = {}         # kind -> array('l') of publications per name id
+
+    @classmethod
+    def build( cls, records, aliases=None ):
+        ''' Build the index from publication records (GooglePatentPublication.dict's).
+            <aliases> is {kind: {variant: name}} for the kinds in KINDS. '''
+        index = cls(aliases)
+        pairs = {kind: set() for kind in cls.KINDS}
+
+        for record in records:
+            ordinal = len(index.ids)
+            index.ids.append(record.get('id'))
+
+            # Raw spellings go through the table, so the alias index learns them; the canonical forms stored at
+            # extraction time are used when the record has them
+            assignee = index.tables['assignee'].intern(record.get('assignee'), record.get('assignee_canonical'))
+            if assignee is not None:
+                pairs['assignee'].add((assignee, ordinal))
+
+            inventors = record.get('inventors') or []
+            canonical = record.get('inventors_canonical') or []
+            if len(canonical) != len(inventors):
+                canonical = [None] * len(inventors)
+            for inventor, inventor_canonical in zip(inventors, canonical):
+                inventor = index.tables['inventors'].intern(inventor, inventor_canonical)
+                if inventor is not None:
+                    pairs['inventors'].add((inventor, ordinal))
+
+        for kind, kind_pairs in pairs.items():
+            kind_pairs = sorted(kind_pairs)
+            index.keys[kind] = array('l', (name_id for name_id, ordinal in kind_pairs))
+            index.postings[kind] = array('l', (ordinal for name_id, ordinal in kind_pairs))
+            index.counts[kind] = array('l', [0] * len(index.tables[kind].names))
+            for name_id in index.keys[kind]:
+                index.counts[kind][name_id] += 1
+        return index
+
+    def canonical( self, name, kind='assignee' ):
+        ''' The canonical name <name> is indexed under, or None '''
+        name_id = self.tables[kind].lookup(name)
+        return None if name_id is None else self.tables[kind].names[name_id]
+
+    def portfolio( self, name, kind='assignee' ):
+        ''' Ids of the publications of <name> (any spelling), in index order '''
+        name_id = self.tables[kind].lookup(name)
+        if name_id is None:
+            return []
+        keys = self.keys[kind]
+        low, high = bisect_left(keys, name_id), bisect_left(keys, name_id + 1)
+        return [self.ids[ordinal] for ordinal in self.postings[kind][low:high]]
+
+    def count( self, name, kind='assignee' ):
+        ''' Number of publications of <name> (any spelling) '''
+        name_id = self.tables[kind].lookup(name)
+        return 0 if name_id is None else self.counts[kind][name_id]
+
+    def top( self, n=20, kind='assignee' ):
+        ''' The <n> largest portfolios: [(canonical name, publications), ...] '''
+        counts = self.counts[kind]
+        best = sorted(range(len(counts)), key=lambda name_id: (-counts[name_id], name_id))[:n]
+        return [(self.tables[kind].names[name_id], counts[name_id]) for name_id in best]
+
+    def save( self, path ):
+        ''' Write the index to <path> (see indexfile.py) '''
+        header = {'ids': self.ids, 'kinds': list(self.KINDS),
+                  'tables': {kind: table.to_json() for kind, table in self.tables.items()}}
+        arrays = [values for kind in self.KINDS for values in (self.keys[kind], self.postings[kind], self.counts[kind])]
+        write_index(path, header, arrays)
+
+    @classmethod
+    def load( cls, path ):
+        header, arrays = read_index(path, 'Name index')
+        index = cls()
+        index.ids = header['ids']
+        for kind, table in header['tables'].items():
+            index.tables[kind].from_json(table)
+        for i, kind in enumerate(header['kinds']):
+            index.keys[kind], index.postings[kind], index.counts[kind] = arrays[3 * i:3 * i + 3]
+        return index
+
+
+def build_index( location, aliases=None, backend='directory' ):
+    ''' Build a NameIndex over every publication in the store at <location> (see backends.open_backend) '''
+    return NameIndex.build(PublicationStore(open_backend(backend, location)), aliases)
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Portfolio counts by canonical assignee over stored publications.')
+    parser.add_argument('--data', required=True, help='directory holding the publication store')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='directory',
+                        help="storage of --data: 'directory' (default) or 'sqlite' (then --data is the database file)")
+    parser.add_argument('--aliases', help='JSON file of {"assignee": {variant: name}, "inventors": {...}} for names '
+                                          'the rules miss')
+    parser.add_argument('--out', help='also write the index to this file')
+    parser.add_argument('--top', type=int, default=20, help='number of largest portfolios to list (default 20)')
+    parser.add_argument('--assignee', help='list the publications of this assignee instead')
+    args = parser.parse_args(argv)
+
+    aliases = None
+    if args.aliases:
+        with open(args.aliases) as f:
+            aliases = json.load(f)
+
+    index = build_index(args.data, aliases, args.backend)
+    if args.out:
+        index.save(args.out)
+
+    if args.assignee:
+        for pub_id in index.portfolio(args.assignee):
+            print(pub_id)
+        return
+
+    for name, count in index.top(args.top):
+        print('{0:>8}  {1}'.format(count, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+""" Pair - structured data from the USPTO Public PAIR archives mirrored on Google storage
+
+Each archive is a zip holding tab separated members per application, e.g.
+    12345678/12345678-application_data.tsv
+    12345678/12345678-transaction_history.tsv
+    12345678/12345678-patent_term_adjustment.tsv
+    12345678/12345678-continuity_data.tsv
+
+The archive is read over HTTP Range requests (HttpFile), so only the central directory and the members asked for
+are downloaded, and each member is decompressed as a stream.  Parsed members can be cached per application number.
+
+extract_pair -  fetch and parse the requested members for an application number
+"""
+
+import io
+import re
+from datetime import date
+
+from extraction import FILEHISTORY_BASE_URL
+
+APPLICATION_DATA = 'application_data'
+TRANSACTION_HISTORY = 'transaction_history'
+PATENT_TERM_ADJUSTMENT = 'patent_term_adjustment'
+CONTINUITY_DATA = 'continuity_data'
+MEMBERS = (APPLICATION_DATA, TRANSACTION_HISTORY, PATENT_TERM_ADJUSTMENT, CONTINUITY_DATA)
+
+PAIR_DATE_PATTERN = re.compile(r'^(\d{2})-(\d{2})-(\d{4})$')
+
+
+def normalize_application_number( application_number ):
+    ''' 'US 12/345,678' or '12/345,678' -> '12345678' (None if there are no digits) '''
+    digits = re.sub(r'\D', '', str(application_number or ''))
+    return digits or None
+
+
+def pair_url( application_number ):
+    return FILEHISTORY_BASE_URL + normalize_application_number(application_number) + '.zip'
+
+
+def parse_pair_date( text ):
+    ''' PAIR dates are 'MM-DD-YYYY'; return 'YYYY-MM-DD', or the text unchanged if it isn't such a date '''
+    m = PAIR_DATE_PATTERN.match(text.strip())
+    if not m:
+        return text
+    try: return date(int(m.group(3)), int(m.group(1)), int(m.group(2))).isoformat()
+    except ValueError: return text
+
+
+def _rows( lines ):
+    ''' Split decoded lines on tabs, dropping blank lines '''
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield [field.strip() for field in line.split('\t')]
+
+
+#-----------------------------------------------------------------------
+# Member parsers - each takes an iterator of decoded lines
+#-----------------------------------------------------------------------
+def parse_application_data( lines ):
+    ''' key<TAB>value lines -> dict, plus 'status' and 'status_date'.  Keys lose any trailing ':'. '''
+    data = {}
+    for row in _rows(lines):
+        if len(row) < 2:
+            continue
+        data[row[0].rstrip(':').strip()] = parse_pair_date(row[1])
+
+    data['status'] = data.get('Status')
+    data['status_date'] = data.get('Status Date')
+    return data
+
+
+def parse_transaction_history( lines ):
+    ''' 'Date<TAB>Transaction Description' table -> [{'date', 'description'}], newest first as in PAIR '''
+    transactions = []
+    for row in _rows(lines):
+        if len(row) < 2 or row[0] == 'Date':
+            continue
+        transactions.append({'date': parse_pair_date(row[0]), 'description': row[1]})
+    return transactions
+
+
+def parse_patent_term_adjustment( lines ):
+    ''' The PTA summary (key:<TAB>value lines) followed by the PTA history table '''
+    summary = {}
+    history = []
+    header = None
+    for row in _rows(lines):
+        if header is None and 'Date' in row and len(row) > 2:
+            header = row
+            continue
+        if header is not None:
+            history.append(dict(zip(header, [parse_pair_date(field) for field in row])))
+        elif len(row) >= 2:
+            summary[row[0].rstrip(':').strip()] = parse_pair_date(row[1])
+
+    total = None
+    for key, value in summary.items():
+        if key.lower().startswith('total pta adjustments') and value.lstrip('-').isdigit():
+            total = int(value)
+    return {'summary': summary, 'history': history, 'total_days': total}
+
+
+def parse_continuity_data( lines ):
+    ''' 'Parent Continuity Data' / 'Child Continuity Data' sections, each a header row and data rows '''
+    continuity = {'parents': [], 'children': []}
+    section = None
+    header = None
+    for row in _rows(lines):
+        if len(row) == 1 and 'continuity data' in row[0].lower():
+            section = 'children' if row[0].lower().startswith('child') else 'parents'
+            header = None
+            continue
+        if section is None:
+            continue
+        if header is None:
+            header = row
+            continue
+        continuity[section].append(dict(zip(header, [parse_pair_date(field) for field in row])))
+    return continuity
+
+
+PARSERS = {APPLICATION_DATA: parse_application_data,
+           TRANSACTION_HISTORY: parse_transaction_history,
+           PATENT_TERM_ADJUSTMENT: parse_patent_term_adjustment,
+           CONTINUITY_DATA: parse_continuity_data}
+
+
+def _member_lines( z, filename ):
+    ''' Decompress one archive member as a stream of decoded lines '''
+    with z.open(filename, 'r') as raw:
+        for line in io.TextIOWrapper(raw, encoding='latin-1', newline=''):
+            yield line
+
+
+def extract_pair( application_number, members=MEMBERS, cache=None ):
+    ''' Return {member: parsed data} for the requested PAIR <members> of <application_number>.
+            Members missing from the archive are left out; None is returned when the archive can't be read.
+            With a cache.PairCache, cached members are used as is and newly parsed ones are stored. '''
+    number = normalize_application_number(application_number)
+    if not number:
+        return None
+
+    result = {}
+    wanted = []
+    for member in members:
+        cached = cache.get(number, member) if cache else None
+        if cached is not None:
+            result[member] = cached
+        else:
+            wanted.append(member)
+    if not wanted:
+        return result
+
+    from zipfile import ZipFile
+    from httpfile import HttpFile
+
+    try:
+        z = ZipFile(HttpFile(pair_url(number)))
+        for filename in z.namelist():
+            for member in wanted:
+                if filename.endswith('-' + member + '.tsv') or filename.endswith('/' + member + '.tsv'):
+                    result[member] = PARSERS[member](_member_lines(z, filename))
+                    if cache:
+                        cache.put(number, member, result[member])
+    except Exception:
+        return result or None
+
+    return result
+
+
+def publication_status( application_number, cache=None ):
+    ''' The PAIR 'Status' of an application, or None '''
+    pair = extract_pair(application_number, members=(APPLICATION_DATA,), cache=cache)
+    if not pair or APPLICATION_DATA not in pair:
+        return None
+    return pair[APPLICATION_DATA]['status']
+
+
+def terminal_disclaimer( transactions ):
+    ''' True if the transaction history records a terminal disclaimer being filed '''
+    return any('terminal disclaimer' in t['description'].lower() for t in transactions)
@@ -1,13 +1,12 @@
 #!/usr/bin/env python
-import re
-import urllib.request, urllib.error
-import htmlmin
-
-from bs4 import BeautifulSoup,SoupStrainer, NavigableString, Tag
-from collections import OrderedDict
-from datetime import datetime
-from httpfile import HttpFile
-from zipfile import ZipFile
+from contextlib import nullcontext
+from extraction import (DEFAULT_PIPELINE, INDEPENDENT_CLAIMS_PIPELINE, build_claim_graph, make_soup, GOOGLE_PATENTS_BASE_URL,
+                        FILEHISTORY_BASE_URL, fetch_html, fetch_page, file_history_url, validate_publication)
+# Defined here before they moved to extraction; re-exported so existing 'from patentapi import ...' keeps working
+from extraction import BuildClaim, BuildClaimElement, strip_claim_number, character_replace, process_citation
+from classification import parse_code
+from memprofile import stage
+import pair
 
 """ PatentHelper - basic definition for GooglePatent, USPTOPatent, EPOPatent
 PatentPub -
@@ -26,6 +25,7 @@ class PatentPublication ( object ):
         self.abstract = None
         self.application_number = None
         self.assignee = None
+        self.assignee_canonical = None      # see names.canonical_assignee
         self.classifications = {'us_classifications': [],
                                 'international_classifications': [],
                                 'cooperative_classifications': [],
@@ -36,6 +36,7 @@ class PatentPublication ( object ):
         self.id = None
         self.kind_code = None
         self.inventors = []
+        self.inventors_canonical = []       # see names.canonical_inventor
         self.priority_date = None
         self.publication_date = None
         self.publication_number = None
@@ -44,6 +45,7 @@ class PatentPublication ( object ):
         # Full Text
         self.full_text = None
         self.claims = []
+        self.claim_graph = build_claim_graph([])
 
         # Citations
         self.backward_citations = []
@@ -60,10 +62,37 @@ class GooglePatentPublication( PatentPublication ):
                     - X: 0-9
                     - KC: kind code
             If <pub_num> is omitted, a blank object will be created.
+            claims, claim_graph, backward_citations and classifications are extracted from the parsed page on first
+            access, so callers that only read the bibliographic fields never pay for them.
+            If <html> is passed (e.g. a cached copy of the page), it is parsed instead of fetching the page.
+            <page> is the same as a dict holding the page under 'html' (e.g. a cache.HtmlCache entry); the page is
+            popped from it, so the caller keeps no reference and the page is freed as soon as it has been parsed.
+            If <biblio> is passed (the 'biblio' of an earlier instance, e.g. from cache.ParsedCache), nothing is fetched
+            or parsed at all.
+            If <profile> (a memprofile.MemoryProfile) is passed, the memory used by parsing and by each extraction,
+            including later lazy ones, is recorded in it.
     """
 
+    # Fields extracted on first access -> name of the pipeline extractor producing them
+    LAZY_FIELDS = {'backward_citations': 'backward_citations',
+                   'classifications': 'classifications',
+                   'claims': 'claims',
+                   'claim_graph': 'claims'}
+
+    # Fields of the dict serialization, in order
+    DICT_FIELDS = ('abstract', 'application_number', 'assignee', 'assignee_canonical', 'backward_citations', 'claims',
+                   'claim_graph', 'classifications', 'country_code', 'family_members', 'filing_date', 'file_history',
+                   'full_text', 'google_priority_date', 'id', 'inventors', 'inventors_canonical', 'kind_code',
+                   'legal_events', 'priority_date', 'publication_number', 'publication_date', 'title')
+
     # Initialization
-    def __init__( self, pub_num=None ):
+    def __init__( self, pub_num=None, pipeline=DEFAULT_PIPELINE, html=None, biblio=None, profile=None, page=None ):
+        # Storage behind the lazy fields (must exist before the base class assigns them)
+        self.__lazy_values = {}
+        self.__lazy_pending = set()
+        self.__soup = None
+        self.profile = profile
+
         ######################################################################################################################################################
         #
         # STEP 1 - Set the initial state of each field in the object
@@ -74,14 +103,19 @@ class GooglePatentPublication( PatentPublication ):
         PatentPublication.__init__(self)
 
         # Constants
-        self.PATENTPUBLICATION_BASE_URL = 'https://www.google.com/patents/'
-        self.FILEHISTORY_BASE_URL = 'http://storage.googleapis.com/uspto-pair/applications/'
+        self.PATENTPUBLICATION_BASE_URL = GOOGLE_PATENTS_BASE_URL
+        self.FILEHISTORY_BASE_URL = FILEHISTORY_BASE_URL
+
+        # The extraction pipeline used to populate the fields from the Google Patents page
+        self.pipeline = pipeline
 
         # Fields in addition to the Base Class (PatentPublication)
         self.file_history = None
         self.terminal_disclaimer = None
         self.pta = None
         self.google_priority_date = None
+        self.pair = None                    # USPTO PAIR data, see populate_file_history
+        self.biblio = None                  # Everything extracted from the page, as plain data (see extraction.py)
 
         ######################################################################################################################################################
         #
@@ -106,9 +140,12 @@ class GooglePatentPublication( PatentPublication ):
         #          When the call results in an error, raise the HTTPError for handling by the calling function.
         #
         ######################################################################################################################################################
-        try: self.__html = self.__get_html(str(pub_num))
-        except urllib.error.HTTPError as e:
-            raise e
+        # Only self.__html refers to the page from here on, so it can be released as soon as it has been parsed
+        self.__html = page.pop('html') if page is not None else html
+        del html
+        if self.__html is None and biblio is None:
+            with stage(self.profile, 'fetch'):
+                self.__html = self.__get_html(str(pub_num))
         #print(self.__html)
 
         ######################################################################################################################################################
@@ -117,365 +154,238 @@ class GooglePatentPublication( PatentPublication ):
         #          to populate the GooglePatentPublication fields.
         #
         ######################################################################################################################################################
-        if self.__html:
+        if biblio is None and self.__html:
+            biblio = self.__parse_biblio()
 
+        if biblio:
             # Populate the Bibliographic fields
-            self.__populate_biblio()
-
-
-
-        # Create a dictionary of the object's properties
-        self.dict = {'abstract': self.abstract,
-                     'application_number': self.application_number,
-                     'assignee': self.assignee,
-                     'backward_citations': self.backward_citations,
-                     'claims': self.claims,
-                     'classifications': self.classifications,
-                     'country_code': self.country_code,
-                     'family_members': self.family_members,
-                     'filing_date': self.filing_date,
-                     'file_history': self.file_history,
-                     'full_text': self.full_text,
-                     'google_priority_date': self.google_priority_date,
-                     'id': self.id,
-                     'inventors': self.inventors,
-                     'kind_code': self.kind_code,
-                     'legal_events': self.legal_events,
-                     'priority_date': self.priority_date,
-                     'publication_number': self.publication_number,
-                     'publication_date': self.publication_date,
-                     'title': self.title
-                    }
+            self.__populate_biblio(biblio)
+
+
+
+    #-----------------------------------------------------------------------
+    # Lazily extracted fields
+    #-----------------------------------------------------------------------
+    def __lazy_get( self, name ):
+        if name in self.__lazy_pending:
+            with stage(self.profile, 'extract ' + self.LAZY_FIELDS[name]):
+                fields = self.pipeline.run_one(self.__soup, self.LAZY_FIELDS[name])
+            for field, extractor in self.LAZY_FIELDS.items():
+                if extractor == self.LAZY_FIELDS[name] and field in fields:
+                    self.__lazy_values[field] = fields[field]
+                    self.__lazy_pending.discard(field)
+
+            # Once everything has been extracted the parsed page is no longer needed
+            if not self.__lazy_pending:
+                self.__soup = None
+        return self.__lazy_values.get(name)
+
+    def __lazy_set( self, name, value ):
+        self.__lazy_values[name] = value
+        self.__lazy_pending.discard(name)
+
+    claims = property(lambda self: self.__lazy_get('claims'), lambda self, value: self.__lazy_set('claims', value))
+    claim_graph = property(lambda self: self.__lazy_get('claim_graph'), lambda self, value: self.__lazy_set('claim_graph', value))
+    backward_citations = property(lambda self: self.__lazy_get('backward_citations'),
+                                  lambda self, value: self.__lazy_set('backward_citations', value))
+    classifications = property(lambda self: self.__lazy_get('classifications'),
+                               lambda self, value: self.__lazy_set('classifications', value))
+
+    def materialize( self ):
+        ''' Extract every lazy field now, and bring self.biblio up to date with them '''
+        for name in list(self.LAZY_FIELDS):
+            value = getattr(self, name)
+            if self.biblio is not None:
+                self.biblio[name] = value
+
+    #-----------------------------------------------------------------------
+    # Serialization
+    #-----------------------------------------------------------------------
+    def to_dict( self, exclude=() ):
+        ''' A new dict of the object's properties, built on demand.  Lazy fields named in <exclude> aren't
+            extracted.  Changes to the returned dict don't change the object. '''
+        result = {field: getattr(self, field) for field in self.DICT_FIELDS if field not in exclude}
+        if self.pair is not None:
+            result['pair'] = self.pair
+            result['pta'] = self.pta
+            result['terminal_disclaimer'] = self.terminal_disclaimer
+        return result
+
+    @property
+    def dict( self ):
+        ''' Python dict of the object's properties.  This is a new dict on every access (see to_dict), so
+            writes such as pat.dict['x'] = ... are lost: keep the dict in a variable and change that. '''
+        return self.to_dict()
+
+    def independent_claims( self ):
+        ''' The claims that don't depend from another claim '''
+        roots = set(self.claim_graph['roots'])
+        return [claim for claim in self.claims if claim['number'] in roots]
+
+    def claim_chain( self, number ):
+        ''' Claim numbers from the independent claim down to claim <number>, e.g. [1, 2, 5] '''
+        graph = self.claim_graph
+        position = {n: i for i, n in enumerate(graph['numbers'])}
+        chain = []
+        while number in position and number not in chain:
+            chain.append(number)
+            number = graph['parents'][position[number]]
+        return list(reversed(chain))
+
+    def dependent_claims( self, number ):
+        ''' Numbers of every claim depending (directly or not) from claim <number>, in claim order '''
+        graph = self.claim_graph
+        position = {n: i for i, n in enumerate(graph['numbers'])}
+        found = set()
+        pending = [number]
+        while pending:
+            n = pending.pop()
+            if n in position:
+                for child in graph['children'][position[n]]:
+                    if child not in found:
+                        found.add(child)
+                        pending.append(child)
+        return [n for n in graph['numbers'] if n in found]
+
+    def parsed_classifications( self ):
+        ''' Return the classifications parsed into classification.Classification tuples (section, class, subclass,
+            group and a compact integer key).  Codes that can't be parsed are left out. '''
+        parsed = {}
+        for scheme, codes in self.classifications.items():
+            parsed[scheme] = [c for c in (parse_code(code, scheme) for code in codes) if c]
+        return parsed
+
+    def populate_file_history( self, cache=None ):
+        ''' Read the USPTO PAIR archive for this application and fill in pta, terminal_disclaimer and pair
+            (status, transaction history, PTA and continuity data).  <cache> is an optional cache.PairCache. '''
+        if not self.file_history:
+            return
+
+        self.pair = pair.extract_pair(self.application_number, cache=cache) or {}
+
+        if pair.PATENT_TERM_ADJUSTMENT in self.pair:
+            self.pta = self.pair[pair.PATENT_TERM_ADJUSTMENT]['total_days']
+        if pair.TRANSACTION_HISTORY in self.pair:
+            self.terminal_disclaimer = pair.terminal_disclaimer(self.pair[pair.TRANSACTION_HISTORY])
+
 
     def __get_html ( self, pub_num ):
-        url = self.PATENTPUBLICATION_BASE_URL + pub_num
-
-        #print('\n\nget_html url parameter: ' + url)
-        req = urllib.request.Request(url,headers={'User-Agent' : 'Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; WOW64; Trident/6.0; EIE10;ENUSMCM'}) # create the Google patents HttpRequest object
-
-        resp = urllib.request.urlopen(req) # create an HttpResponse object, open the url request and place the response into the HttpResponse object
-        #html = str(resp.read())
-        html = resp.read().decode('utf-8')
-        #print(htmlmin.minify(html).encode('utf-8'))
-        return htmlmin.minify(html)
-
-    def __populate_biblio( self ):
-        #print(self.publication_number)
-
-        # create a BS4 object to parse the Google HTML
-        strainer = SoupStrainer('html')
-        bSoup = BeautifulSoup(self.__html, 'lxml', parse_only=strainer)
-
-        # In the Google HTML, there is a <table> element with class="patent-bibdata". This table has most of the bibliographic
-        # data in table cells adjacent to cells with the data heading with class "patent-bibdata-heading".  We'll use BS4's
-        # 'next_sibling' method to get the data after finding the data heading
-        soupTable = bSoup.find("table", class_="patent-bibdata")
-        biblio_list = soupTable.find_all("td", class_="patent-bibdata-heading")
-
-        # Kind Code
-        for item in biblio_list:
-            # Patent Number (set the patent object's CC, NUM and KC)
-            # Iterate through the <TD> items using BS4, and find the one with text "Publication number"
-            # The sibling "<TD>" should hold the Publication Number data, so use "next_sibling" and
-            # get the text using "getText() method
-
-            if (((item.getText()).lower() == 'publication number') and not(self.kind_code)):
-                full_num = item.next_sibling.getText()    # should be of form "CCXXXXXXXKC"
-                #print(full_num)
-                kind_code = full_num[-2:].strip()                # kind_code is last
-                #print(kind_code)
-                country = full_num[:2].strip()
-                #print(country)
-                publ_num = (full_num[2:-2]).strip()
-                #print('num = ' + publ_num)
-
-                self.id = country + publ_num + kind_code
-                self.publication_number = publ_num
-                self.kind_code = kind_code
-                self.country_code = country
-
-            # Application Number
-            if ((item.getText()).lower() =='application number'):
-                app_num = (item.next_sibling.getText()).strip()
-                app_num = app_num[2:len(app_num)].strip()
-                self.application_number = app_num
-
-            # Google's calculated Priority Date
-            try:
-                if ((item.getText()).lower() == 'priority date'):
-                    google_priority_date = (item.next_sibling.getText()).strip()
-                    self.google_priority_date = datetime.strptime(google_priority_date,  '%b %d, %Y').strftime('%Y-%m-%d')
-                    #print('Google Priority Date: ' + str(self.google_priority_date))
-            except:
-                pass
-
-            # Publication Date
-            try:
-                if ((item.getText()).lower() =='publication date'):
-                    pub_date = (item.next_sibling.getText()).strip()
-                    self.publication_date = datetime.strptime(pub_date,  '%b %d, %Y').strftime('%Y-%m-%d')
-                    #print('Publication Date: ' + str(self.publication_date))
-            except:
-                pass
-
-            # Filing Date
-            try:
-                if ((item.getText()).lower() =='filing date'):
-                    filing_date = (item.next_sibling.getText()).strip()
-                    self.filing_date = datetime.strptime(filing_date,  '%b %d, %Y').strftime('%Y-%m-%d')
-                    #print('Filing Date: ' + str(self.filing_date))
-            except:
-                pass
-
-            # Family - Publications related to the requested publication
-            if ((item.getText()).lower() =='also published as'):
-                other_pubs = (item.next_sibling.getText()).strip()
-                self.family_members = other_pubs.split(", ")
-                #print('Family Members: ' + str(self.family_members))
-
-
-            # Inventors
-            if ((item.getText()).lower() =='inventors'):
-                inventors = (item.next_sibling.getText()).strip()
-                self.inventors = inventors.split(', ')
-                #print('Inventors: ' + str(self.inventors))
-
-            # Assignee
-            if ((item.getText()).lower() =='original assignee'):
-                original_assignee = (item.next_sibling.getText()).strip()
-                self.assignee = original_assignee
-                #print('Assignee: ' + self.assignee)
+        return fetch_html(pub_num, self.PATENTPUBLICATION_BASE_URL)
 
-        #
-        # Add biblio items not in the biblio table
-        #
-        # Title
-        try:
-            title_meta = bSoup.find('meta', attrs={'name':'DC.title'})    # this is a bs4 Tag element
-            title_text = character_replace(title_meta['content'])
-            self.title = title_text
-            #print('Title: ' + self.title)
-        except: pass
-
-        # Abstract
-        try:
-            self.abstract = character_replace((bSoup.find('abstract').getText()).strip())
-        except: pass
-        #print('ABSTRACT: ' + self.abstract)
-
-        # Backward Citations
-        backward_citation_table = None
-        try:
-            backward_citation_table = bSoup.find('a', {'id': 'backward-citations'}).parent.findNext('table')
-        except:pass
-        if backward_citation_table:
-            cite_numbers = backward_citation_table.findAll('td', class_="patent-data-table-td citation-patent")
-            for item in cite_numbers:
-                cite = process_citation(item.get_text())
-                if (cite['publication_number'] != ''):
-                    self.backward_citations.append(cite)
-        #print('Backward Citations: ' + str(self.backward_citations))
-
-
-        #-----------------------------------------------------------------------
-        # Classifications
-        #-----------------------------------------------------------------------
-
-        #us_classes
-        us_classifications = []
-        us_classes = bSoup.findAll('td', text = re.compile('U.S. Classification'), attrs={'class', 'patent-data-table-td'})
-        if us_classes:
-            us_classifications = [x.strip() for x in (us_classes[0].next_sibling.get_text()).split(',')]
-
-        #international_classes
-        international_classifications = []
-        int_classes = bSoup.findAll('td', text = re.compile('International Classification'), attrs={'class', 'patent-data-table-td'})
-        if int_classes:
-            international_classifications = [x.strip() for x in (int_classes[0].next_sibling.get_text()).split(',')]
-
-        #coop_classes
-        cooperative_classifications = []
-        coop_classes = bSoup.findAll('td', text = re.compile('Cooperative Classification'), attrs={'class', 'patent-data-table-td'})
-        if coop_classes:
-            cooperative_classifications = [x.strip() for x in (coop_classes[0].next_sibling.get_text()).split(',')]
-
-        #ep_classes
-        ep_classifications = []
-        ep_classes = bSoup.findAll('td', text = re.compile('European Classification'), attrs={'class', 'patent-data-table-td'})
-        if ep_classes:
-            ep_classifications = [x.strip() for x in (ep_classes[0].next_sibling.get_text()).split(',')]
-
-        self.classifications = {'us_classifications': us_classifications,
-                                'international_classifications': international_classifications,
-                                'cooperative_classifications': cooperative_classifications,
-                                'ep_classifications': ep_classifications}
+    def __parse_biblio( self ):
+        # Run the shared extraction pipeline over the page, leaving the lazy fields for later.  The parsed page is
+        # kept for them instead of the HTML.
+        with stage(self.profile, 'parse'):
+            self.__soup = make_soup(self.__html)
+            self.__html = None
+        with stage(self.profile, 'extract biblio'):
+            biblio = self.pipeline.run_soup(self.__soup, skip=set(self.LAZY_FIELDS.values()))
 
         #---------------------------------------------------
         # Determine if the file history is available
         #---------------------------------------------------
-        temp_appNum = str(self.application_number).replace(',','')
-        temp_appNum = temp_appNum.replace('/', '')
-        #print('\n\nTemp appNum: ' + temp_appNum)
-
-        url = self.FILEHISTORY_BASE_URL + temp_appNum + '.zip'
-        #print('\n\nPAIR URL: ' + url + '\n\n')
-        z = None
-        try: z = ZipFile(HttpFile(url))
-        except: pass
-
-        if z : self.file_history = url
-        #print('\n\nfile history link: ' + str(self.file_history) + '\n\n')
-
-
-        #---------------------------------------------------
-        # Get the Claims
-        #---------------------------------------------------
-        claims = []     # Initialize the claims array to an emtpy array
-
-        # Google Patents keeps the claims deep within a div having a class="patent-claims-section"
-        # Within this div is a div that has a class="claims".  This is the only div in the page having class=claims
-        # Using BS4, we can extract this div by searching on class_="claims".
-        soupClaimsContainer = bSoup.find('div', class_="claims")
-
-        # The soupClaimsContainer contains DIV elements that represent each claim.
-        # Each claim has a class that is either "claim" (for independent claims) or "claim-dependent" (for dependent claims)
-        soupClaimsList = soupClaimsContainer.find_all('div', recursive=False)
-
-
-        # Each claim will comprise NavigableStrings and other Tag elements (mostly DIVs containing other DIVs or NavigableStrings)
-        # The <div class="claim [claim-dependent]"> container will contain a single DIV with id=:CLM-XXXXX", num="XXXXX", class="claim"
-        # This is the outer-most container of the individual claim information.
-        # Iterating through the soupClaimsList list, we can extract information or further process each individual claim
-        for iClaim in soupClaimsList:
-            claim = {'depends-from':None}       # initialize an object to contain the claim information
-                                                # for our GooglePatentPublication object
-                                                # initially, we set the "depends-from" property to None to default to an
-                                                # independent claim
-
-            # claimContainer will be the DIV with id, num and class attributes
-            # set recursive=False because we only want the top level DIVs
-            claimContainer = iClaim.find('div', recursive=False)
-
-            # Add the 'number' property to the claim object  Number identifies the claim by number
-            claim['number'] = int(claimContainer['num'])
-
-            # claimElementContainersList will be a list of DIV elements that contain the text of the claim
-            # set recursive=False because we only want the top level DIVs
-            claimElementContainersList = claimContainer.find_all('div', recursive=False)
-            # BuildClaim will create the JSON structure for each claim
-            BuildClaim(claimElementContainersList, claim)
-
-            # Add the JSON claim to the claims list
-            claims.append(claim)
-
-        self.claims = claims
-
-def BuildClaim(containerList, claim):
-    ''' Analyze the claim information returned from Google Patents and transform it into a JSON representation.'''
-
-    # Initialize an array to hold the claim elements
-    claim_elements = []
-    # containerList was passed in as a parameter and holds a list of DIV elements that contain element text and
-    # other DIVs comprising sub-elements.
-    # We loop through the list and determine if this is a dependent or independent claim
-    for container in containerList:
-        #look for a <claim-ref> tag.  If it exists, this is a dependent claim, so we will
-        # set claim['depends-from'] = to the clim's parent number, which can be derived from the claim-ref tag's
-        # idref attribute
-        claimref = container.find('claim-ref')
-        if claimref:
-            # idref is in the form CLM-XXXXX.  We split that string and select only the numerical portion.
-            # don't forget to cast the number to an INTEGER
-            claim['depends-from'] = int(claimref['idref'].split('-')[1])
-
-        # TODO: There are tags that will appear in some patent claims and not others (e.g., <CHEMISTRY>.
-        # Need to add support for these as they arise.
-
-        # Now pass the container to the BuildClaimElement function, which returns a JSON object representing the
-        # claim element.  Then, append that claim element to the claim_elements list
-        claim_elements.append(BuildClaimElement(container))
-
-
-    # after all the container items have been processed, the claim_elements list should contain a JSON object representing
-    # all of the elements in the claim.  We then add that object to the 'elements' property of the claim object.
-    claim['elements'] = claim_elements
-    return
-
-
-def BuildClaimElement(container):
-    ''' Build an element of the JSON claim structure. '''
-    element = {}                                                    #initialize the element object
-    element_text = ''                                               #initialize the element's text
-    element_children = container.find_all('div', recursive=False)   #find all child elements, if any
-
-    # interate through all the contents of the bSoup container to build the text of the claim element
-    for child in container.children:
-        # if the child element is a NavigableString, it's part of the text for the claim element
-        # otherwise, it's probably a child element
-        if (child.string and (not child.name == 'div')):
-        #if (isinstance(child, NavigableString) and not(child.string.strip() == '')) or child.name == 'claim-ref' :
-            element_text += child.string
-
-    # Once the element text is built, add it to the 'text' property of the element object
-    element['text'] = (strip_claim_number(element_text.strip())).strip()
-    #element['text'] = (element_text.strip()).strip()
-
-    element['children'] = []        # child elements will be stored in an array of element objects, so init the children property
-
-    # Now loop through the child elements we found above and call this function recursively to build the child elements
-    for elem in element_children:
-        new_elements = []
-        element['children'].append(BuildClaimElement(elem))
-
-    #elements.append(element)
-    return element
-
-
-def strip_claim_number(text):
-    import re
-    pattern = '^\d{0,3}\.\s{1,5}'
-
-    return re.sub(pattern, '', text)
-
-
-
-def validate_publication( publication_number ):
-    import re
-
-    # Strip leading/trailing whitespace and remove specific characters that may be passed in.
-    # The goal is to have only form CC[XXXXXXXXXX]XKC
-    publication_number = re.sub('[^0-9a-zA-Z]+', '', publication_number)
-    #print('re.sub: "' + publication_number + '"')
-
-    pattern = r"(?P<cc>[A-Za-z]{2})(?P<pub>[0-9]{1,12})(?P<kc>[A-Za-z]?[1-9]?)" # Regular Expression to match Google Patent's
-    m = re.match(pattern, publication_number)
-
-    if m:
-        #print('Match! --> ' + m.group(0) + '\n\n')
-        return publication_number
-
-    return False
-
-# This function will take a string and replace entities that were badly decoded from unicode by BS4
-# This is a stop-gap until I figure out a more elegant solution
-# Add entities as they are discovered.
-def character_replace( strng ):
-    strng = strng.replace("\\xe2\\x80\\x98", "'")
-    strng = strng.replace("\\xe2\\x80\\x99", "'")
-    strng = strng.replace("\\n","")
-
-    return strng
-
-def process_citation( strng ):
-    cite = {}
-    if "*" not in strng:
-        cite = {'publication_number': strng.strip(),
-                'cited_by_examiner': False}
-    else:
-        strng = strng.replace('*','')
-        cite = {'publication_number': strng.strip(),
-                'cited_by_examiner': True}
-    return cite
+        biblio['file_history'] = file_history_url(biblio['application_number'])
+        return biblio
+
+    def __populate_biblio( self, biblio ):
+        # Copy the extracted fields onto the object
+        self.biblio = biblio
+
+        self.id = biblio['id']
+        self.publication_number = biblio['publication_number']
+        self.kind_code = biblio['kind_code']
+        self.country_code = biblio['country_code']
+        self.application_number = biblio['application_number']
+        self.google_priority_date = biblio['priority_date']
+        self.publication_date = biblio['publication_date']
+        self.filing_date = biblio['filing_date']
+        self.family_members = biblio['family_members']
+        self.inventors = biblio['inventors']
+        self.inventors_canonical = biblio.get('inventors_canonical') or []
+        self.assignee = biblio['assignee']
+        self.assignee_canonical = biblio.get('assignee_canonical')
+        self.title = biblio['title']
+        self.abstract = biblio['abstract']
+        self.file_history = biblio['file_history']
+
+        # Fields already in <biblio> (e.g. from the parsed cache) are used as is; the rest are extracted on first access
+        for name, extractor in self.LAZY_FIELDS.items():
+            if name in biblio:
+                self.__lazy_set(name, biblio[name])
+            elif self.__soup is not None and extractor in self.pipeline.extractors:
+                self.__lazy_pending.add(name)
+
+
+def _cached_publication( pub_num, parsed_cache, independent_claims ):
+    biblio = parsed_cache.get(pub_num)
+    if biblio is None:
+        return None
+    if independent_claims:
+        roots = set(biblio['claim_graph']['roots'])
+        biblio['claims'] = [claim for claim in biblio['claims'] if claim['number'] in roots]
+    return GooglePatentPublication(pub_num, biblio=biblio)
+
+
+# How long load_publication waits for another worker fetching the same publication before fetching it itself.  A fetch
+# makes up to four requests (the page, then file_history_url's HEAD and Range requests), each of which may take
+# LiveTransport's 30 second timeout, so this is longer than the worst case.
+FETCH_LOCK_TIMEOUT = 180
+
+
+def load_publication( pub_num, html_cache=None, parsed_cache=None, independent_claims=False,
+                      lock_timeout=FETCH_LOCK_TIMEOUT, profile=None ):
+    ''' Return a GooglePatentPublication for <pub_num>, going through the optional caches:
+            cache.ParsedCache - hits skip fetching and parsing altogether
+            cache.HtmlCache -   hits skip fetching; the page is still parsed
+        Fetched pages and parse results are added to the caches, except oversized pages, which are only fetched
+        reduced (see extraction.fetch_page) and so are fetched again on every parse.
+        On a miss, the publication is fetched and parsed under the cache backend's lock for it, so when several
+        workers share the caches only one of them fetches it; the others wait (up to <lock_timeout> seconds, then
+        fetch anyway) and find it in the cache.
+        With <independent_claims>, only independent claims are returned and dependent claims are never built
+        (claim_graph still covers every claim).
+        <profile> is an optional memprofile.MemoryProfile recording the memory used by each stage. '''
+    valid_num = validate_publication(pub_num)
+    if not valid_num:
+        raise ValueError("Missing or invalid publication number, '" + str(pub_num) + "'.")
+
+    if parsed_cache:
+        pat = _cached_publication(valid_num, parsed_cache, independent_claims)
+        if pat is not None:
+            return pat
+
+    cache = html_cache or parsed_cache
+    with (cache.backend.lock('fetch/' + valid_num, lock_timeout) if cache else nullcontext()):
+        # Another worker may have loaded it while this one waited for the lock
+        if parsed_cache:
+            pat = _cached_publication(valid_num, parsed_cache, independent_claims)
+            if pat is not None:
+                return pat
+
+        # The page is handed over in a dict that GooglePatentPublication empties, so no reference to it is left
+        # here while it is parsed and the soup extracted (an argument would stay referenced until the call returns)
+        page = None
+        if html_cache:
+            with stage(profile, 'fetch'):
+                page = html_cache.get(valid_num)
+                if not page:
+                    status, headers, html, complete = fetch_page(valid_num)
+                    if complete:
+                        html_cache.put(valid_num, html, etag=headers.get('ETag'),
+                                       last_modified=headers.get('Last-Modified'))
+                    page = {'html': html}
+                    del html
+
+        if independent_claims:
+            # A partial result, so it isn't added to the parsed cache
+            return GooglePatentPublication(valid_num, pipeline=INDEPENDENT_CLAIMS_PIPELINE, page=page, profile=profile)
+
+        pat = GooglePatentPublication(valid_num, page=page, profile=profile)
+        if parsed_cache and pat.biblio:
+            # Caching needs the complete result, so the lazy fields are extracted now (which also frees the soup)
+            pat.materialize()
+            parsed_cache.put(valid_num, pat.biblio)
+        return pat
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+""" Prefetch - background warming of the page caches
+
+After a publication is served, its family members and backward citations are queued at low priority and loaded
+into the caches by a background thread, so the likely next click is a cache hit.  Prefetching is bounded by a
+per-minute budget and a queue limit, and it pauses while any foreground request is in progress.  The budget, queue
+and foreground count belong to one Prefetcher, i.e. one process: each worker process of a server has its own.
+
+Prefetcher - the queue, budget and worker thread
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import PriorityQueue, Empty, Full
+
+# Queue priorities (lower is loaded first)
+FAMILY = 1
+CITATION = 2
+
+
+class Prefetcher ( object ):
+    """ Loads queued publications in the background.
+            <load> is called with a publication number and is expected to populate the caches (e.g. a partial of
+            patentapi.load_publication); its result is discarded and its errors ignored.
+            <is_cached> (optional) returns True for publications that don't need loading.
+            <accept> (optional) filters which publication numbers are worth queueing.
+            <budget> is the most publications loaded per minute; <per_publication> the most queued per served page.
+    """
+
+    def __init__( self, load, is_cached=None, accept=None, budget=30, per_publication=10, max_queue=1000,
+                  remember=10000 ):
+        self.load = load
+        self.is_cached = is_cached
+        self.accept = accept
+        self.budget = budget
+        self.per_publication = per_publication
+        self.remember = remember
+
+        self.queue = PriorityQueue(maxsize=max_queue)
+        self.loaded = 0
+        self.__sequence = 0
+        self.__seen = OrderedDict()         # recently queued publication numbers, oldest first
+        self.__lock = threading.Lock()
+
+        # Foreground requests in progress; the worker waits for this to drop to zero
+        self.__foreground = 0
+        self.__idle = threading.Condition(self.__lock)
+
+        # Budget window
+        self.__window_start = time.monotonic()
+        self.__window_count = 0
+
+        self.__stopping = threading.Event()
+        self.__thread = None
+
+    #-----------------------------------------------------------------------
+    # Foreground side
+    #-----------------------------------------------------------------------
+    @contextmanager
+    def foreground( self ):
+        ''' Wrap request handling in this so prefetching yields to it '''
+        with self.__lock:
+            self.__foreground += 1
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__foreground -= 1
+                if not self.__foreground:
+                    self.__idle.notify_all()
+
+    def enqueue( self, pub_num, priority=CITATION ):
+        ''' Queue <pub_num> unless it was queued recently, is filtered out, or the queue is full.
+            Returns True if it was queued. '''
+        if not pub_num or (self.accept and not self.accept(pub_num)):
+            return False
+
+        with self.__lock:
+            if pub_num in self.__seen:
+                return False
+            self.__seen[pub_num] = True
+            if len(self.__seen) > self.remember:
+                self.__seen.popitem(last=False)
+            self.__sequence += 1
+            sequence = self.__sequence
+
+        try: self.queue.put_nowait((priority, sequence, pub_num))
+        except Full:
+            return False
+        return True
+
+    def enqueue_related( self, record ):
+        ''' Queue the family members and then the backward citations of a served publication (its dict) '''
+        candidates = [(FAMILY, pub_num) for pub_num in (record.get('family_members') or [])]
+        candidates += [(CITATION, cite['publication_number']) for cite in (record.get('backward_citations') or [])]
+
+        queued = 0
+        for priority, pub_num in candidates:
+            if queued >= self.per_publication:
+                break
+            if self.enqueue(pub_num, priority):
+                queued += 1
+        return queued
+
+    #-----------------------------------------------------------------------
+    # Background side
+    #-----------------------------------------------------------------------
+    def start( self ):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name='prefetch', daemon=True)
+            self.__thread.start()
+
+    def stop( self, timeout=None ):
+        self.__stopping.set()
+        with self.__lock:
+            self.__idle.notify_all()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def __wait_for_idle( self ):
+        with self.__lock:
+            while self.__foreground and not self.__stopping.is_set():
+                self.__idle.wait(0.5)
+
+    def __wait_for_budget( self ):
+        while not self.__stopping.is_set():
+            now = time.monotonic()
+            if now - self.__window_start >= 60:
+                self.__window_start = now
+                self.__window_count = 0
+            if self.__window_count < self.budget:
+                self.__window_count += 1
+                return
+            self.__stopping.wait(60 - (now - self.__window_start))
+
+    def __run( self ):
+        while not self.__stopping.is_set():
+            try: priority, sequence, pub_num = self.queue.get(timeout=0.5)
+            except Empty:
+                continue
+
+            # Nothing about one entry (a backend error in is_cached, a failed load) may end the thread: nobody restarts it
+            try:
+                if self.is_cached and self.is_cached(pub_num):
+                    continue
+
+                self.__wait_for_budget()
+                self.__wait_for_idle()
+                if self.__stopping.is_set():
+                    break
+
+                self.load(pub_num)
+                self.loaded += 1
+            except Exception:
+                pass        # a failed prefetch only means a cold fetch later
+            finally:
+                self.queue.task_done()
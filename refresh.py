@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+""" Refresh - incremental re-scrape of stored publications
+
+Each cached page is revalidated with If-None-Match / If-Modified-Since.  When the server ignores those headers
+the page's content hash is compared instead.  Only pages that actually changed are parsed again, and for each of
+them the changed fields are reported.  Oversized pages are fetched reduced (see extraction.fetch_page) and not cached,
+so they are fetched and parsed in full every time, and only the parsed fields are compared.
+
+    python refresh.py --data DIR [--backend sqlite] [--workers N] [PUB_NUM ...]
+
+With no publication numbers, every publication in the store is refreshed.  One JSON line is printed per
+changed or failed publication: {"publication": ..., "outcome": ..., "changes": {field: {"old": ..., "new": ...}}}
+Parse results cached by older parser versions are deleted first (see cache.ParsedCache.purge).
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from backends import BACKENDS, open_backend
+from cache import HtmlCache, ParsedCache, content_hash
+from extraction import fetch_page, validate_publication
+from patentapi import GooglePatentPublication
+from store import PublicationStore
+
+# Outcome of refreshing one publication
+NOT_MODIFIED = 'not-modified'   # 304 from the server
+UNCHANGED = 'unchanged'         # 200, but the same content (or the same parsed fields)
+CHANGED = 'changed'
+FAILED = 'failed'
+
+
+def diff_records( old, new ):
+    ''' Return {field: {'old': ..., 'new': ...}} for every top-level field that differs '''
+    old = old or {}
+    changes = {}
+    for field in sorted(set(old) | set(new)):
+        if old.get(field) != new.get(field):
+            changes[field] = {'old': old.get(field), 'new': new.get(field)}
+    return changes
+
+
+def _parse( pub_num, html ):
+    # JSON round-trip so the new record compares equal to what the store returns for unchanged fields
+    return json.loads(json.dumps(GooglePatentPublication(pub_num, html=html).dict))
+
+
+def refresh_publication( pub_num, html_cache, store, parsed_cache=None ):
+    ''' Revalidate one publication.  Returns (outcome, changes) where changes is a diff_records() dict.
+        When the page changed, its entry in <parsed_cache> (a cache.ParsedCache, if given) is dropped so the API
+        parses the new page instead of serving the old result. '''
+    entry = html_cache.get_meta(pub_num) or {}
+
+    status, headers, html, complete = fetch_page(pub_num, etag=entry.get('etag'),
+                                                 last_modified=entry.get('last_modified'))
+    if status == 304:
+        html_cache.touch(pub_num)
+        if pub_num in store:
+            return NOT_MODIFIED, {}
+
+        # Cached (e.g. by the API service) but never stored: the cached page is the current one, so store it
+        cached = html_cache.get(pub_num)
+        if cached is None:
+            raise ValueError('Not Modified, but ' + pub_num + ' is missing from the page cache')
+        record = _parse(pub_num, cached['html'])
+        store.put(pub_num, record)
+        return CHANGED, diff_records(None, record)
+
+    # The upstream doesn't always honour conditional requests, so fall back to comparing content
+    if complete and entry.get('sha1') == content_hash(html) and pub_num in store:
+        html_cache.touch(pub_num)
+        return UNCHANGED, {}
+
+    # Parsed before the page is cached, so a page that fails to parse is fetched again next time
+    record = _parse(pub_num, html)
+    if complete:
+        html_cache.put(pub_num, html, etag=headers.get('ETag'), last_modified=headers.get('Last-Modified'))
+    else:
+        html_cache.delete(pub_num)          # the page outgrew the limit: don't keep serving the old one
+    if parsed_cache is not None:
+        parsed_cache.delete(pub_num)
+
+    changes = diff_records(store.get(pub_num), record)
+    if not changes:
+        return UNCHANGED, {}
+
+    store.put(pub_num, record)
+    return CHANGED, changes
+
+
+def refresh( pub_nums, html_cache, store, workers=8, parsed_cache=None ):
+    ''' Refresh <pub_nums> concurrently, yielding (pub_num, outcome, changes) in order '''
+    def run( pub_num ):
+        try:
+            outcome, changes = refresh_publication(pub_num, html_cache, store, parsed_cache)
+        except Exception as e:
+            # One bad publication (network, parse or storage error) must not end the whole run
+            return pub_num, FAILED, {'error': '{0}: {1}'.format(type(e).__name__, e)}
+        return pub_num, outcome, changes
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(run, pub_nums):
+            yield result
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Revalidate stored publications and print the fields that changed.')
+    parser.add_argument('--data', required=True, help='directory holding the page cache and publication store')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='directory',
+                        help="storage of --data: 'directory' (default) or 'sqlite' (then --data is the database file)")
+    parser.add_argument('--workers', type=int, default=8, help='concurrent requests (default 8)')
+    parser.add_argument('publications', nargs='*', help='publication numbers (default: everything in the store)')
+    args = parser.parse_args(argv)
+
+    backend = open_backend(args.backend, args.data)
+    html_cache = HtmlCache(backend)
+    store = PublicationStore(backend)
+    parsed_cache = ParsedCache(backend)
+    purged = parsed_cache.purge()
+
+    pub_nums = [validate_publication(p) for p in args.publications] or store.keys()
+    counts = {}
+    for pub_num, outcome, changes in refresh([p for p in pub_nums if p], html_cache, store, args.workers,
+                                              parsed_cache):
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if outcome in (CHANGED, FAILED):
+            print(json.dumps({'publication': pub_num, 'outcome': outcome, 'changes': changes}))
+
+    if purged:
+        counts['purged'] = purged
+    print(json.dumps(counts), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+""" Similarity - MinHash/LSH index for finding publications with near-identical independent claims or abstracts
+
+SimilarityIndex -  MinHash signatures of each independent claim and abstract, banded into LSH buckets
+build_index -      a SimilarityIndex over every publication in a store
+
+Each independent claim and each abstract is one document: its text is lower-cased, split into words and turned into
+overlapping word shingles.  A document's signature is the minimum of NUM_PERM hash functions over its shingles, and
+the fraction of equal signature positions estimates the Jaccard similarity of two documents' shingle sets.
+Signatures are split into bands; documents sharing any band land in the same bucket, so a query only compares
+against the documents in its buckets instead of the whole collection.
+
+Shingle hashing and MinHash are vectorized with numpy, which is imported only when an index is built or queried.
+
+    python similarity.py --data DIR [--backend sqlite] --out similarity.idx
+"""
+
+import argparse
+import re
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+from backends import BACKENDS, open_backend
+from extraction import claim_text
+from indexfile import read_index, write_index
+from store import PublicationStore
+
+# Kinds of document
+CLAIMS = 'claims'
+ABSTRACT = 'abstract'
+KINDS = (CLAIMS, ABSTRACT)
+
+NUM_PERM = 128
+BANDS = 16              # 16 bands of 8 rows: documents above roughly 0.7 similarity almost always share a bucket
+SHINGLE_SIZE = 3
+CHUNK_SIZE = 4096       # shingles hashed at a time, bounding the (NUM_PERM x shingles) work array
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def _numpy():
+    try: import numpy
+    except ImportError:
+        raise ImportError('The similarity index requires numpy (pip install numpy)')
+    return numpy
+
+
+def documents( record, kinds=KINDS ):
+    ''' Yield (kind, label, text) for the independent claims and the abstract of a publication record '''
+    if CLAIMS in kinds:
+        for claim in record.get('claims') or []:
+            if claim.get('depends-from') is None:
+                yield CLAIMS, 'claim ' + str(claim.get('number')), claim_text(claim)
+    if ABSTRACT in kinds and record.get('abstract'):
+        yield ABSTRACT, ABSTRACT, record['abstract']
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash( word ):
+    return zlib.crc32(word.encode('utf-8'))
+
+
+class SimilarityIndex ( object ):
+    """ MinHash signatures of documents (independent claims and abstracts), with LSH buckets over them.
+            Signatures are rows of a (documents x num_perm) uint32 array; the buckets are rebuilt from it on load.
+    """
+
+    def __init__( self, num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE, seed=1 ):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        np = _numpy()
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        # Multiply-shift hash functions: ((a * x + b) mod 2**64) >> 32, with odd a
+        rng = np.random.default_rng(seed)
+        self.__a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.__b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        # Per-position multipliers combining the word hashes of a shingle
+        self.__mix = rng.integers(0, 1 << 63, shingle_size, dtype=np.uint64) | np.uint64(1)
+
+        self.ids = []                   # ordinal -> publication id
+        self.doc_ids = []               # document -> publication ordinal
+        self.doc_kinds = []             # document -> CLAIMS or ABSTRACT
+        self.doc_labels = []            # document -> 'claim 1', 'abstract', ...
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self.__pending = []             # signatures added since the array was last rebuilt
+        self.__buckets = [defaultdict(list) for band in range(bands)]
+
+    #-----------------------------------------------------------------------
+    # Signatures
+    #-----------------------------------------------------------------------
+    def shingles( self, text ):
+        ''' The distinct shingle hashes of <text>, as a uint64 array '''
+        np = _numpy()
+        words = np.fromiter((_word_hash(w) for w in WORD_PATTERN.findall(text.lower())), dtype=np.uint64)
+        if not len(words):
+            return words
+
+        k = min(self.shingle_size, len(words))
+        count = len(words) - k + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for position in range(k):
+            hashes += words[position:position + count] * self.__mix[position]
+        hashes ^= hashes >> np.uint64(29)
+        return np.unique(hashes)
+
+    def signature( self, text ):
+        ''' The MinHash signature of <text> (uint32 array of num_perm), or None if it has no words '''
+        np = _numpy()
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        for start in range(0, len(shingles), CHUNK_SIZE):
+            chunk = shingles[start:start + CHUNK_SIZE]
+            hashed = ((self.__a[:, None] * chunk[None, :] + self.__b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature
+
+    def __band_keys( self, signature ):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    #-----------------------------------------------------------------------
+    # Building
+    #-----------------------------------------------------------------------
+    def add( self, record, kinds=KINDS ):
+        ''' Add the independent claims and abstract of a publication record (GooglePatentPublication.dict) '''
+        ordinal = len(self.ids)
+        self.ids.append(record.get('id'))
+        for kind, label, text in documents(record, kinds):
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            document = len(self.doc_ids)
+            self.doc_ids.append(ordinal)
+            self.doc_kinds.append(kind)
+            self.doc_labels.append(label)
+            self.__pending.append(signature)
+            for band, key in enumerate(self.__band_keys(signature)):
+                self.__buckets[band][key].append(document)
+
+    def __flush( self ):
+        if self.__pending:
+            np = _numpy()
+            self.signatures = np.vstack([self.signatures] + self.__pending)
+            self.__pending = []
+
+    @classmethod
+    def build( cls, records, kinds=KINDS, **options ):
+        ''' Build the index from publication records '''
+        index = cls(**options)
+        for record in records:
+            index.add(record, kinds)
+        index.__flush()
+        return index
+
+    #-----------------------------------------------------------------------
+    # Queries
+    #-----------------------------------------------------------------------
+    def __candidates( self, signature, kind ):
+        candidates = set()
+        for band, key in enumerate(self.__band_keys(signature)):
+            candidates.update(self.__buckets[band].get(key, ()))
+        return sorted(d for d in candidates if kind is None or self.doc_kinds[d] == kind)
+
+    def query( self, record, threshold=0.8, kind=CLAIMS, limit=None ):
+        ''' Publications with a document of <kind> (CLAIMS, ABSTRACT or None for both) at least <threshold> similar
+            to one of <record>'s, best first:
+                [{'id', 'similarity', 'matches': [{'part', 'matched', 'similarity'}, ...]}, ...]
+            The record's own publication is left out. '''
+        self.__flush()
+
+        found = {}
+        for doc_kind, label, text in documents(record, KINDS if kind is None else (kind,)):
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            candidates = self.__candidates(signature, doc_kind)
+            if not candidates:
+                continue
+
+            # Estimated Jaccard similarity of every candidate at once
+            similarities = (self.signatures[candidates] == signature).mean(axis=1)
+            for document, similarity in zip(candidates, similarities.tolist()):
+                pub_id = self.ids[self.doc_ids[document]]
+                if similarity < threshold or pub_id == record.get('id'):
+                    continue
+                match = found.setdefault(pub_id, {'id': pub_id, 'similarity': 0.0, 'matches': []})
+                match['matches'].append({'part': label, 'matched': self.doc_labels[document],
+                                         'similarity': similarity})
+                match['similarity'] = max(match['similarity'], similarity)
+
+        results = sorted(found.values(), key=lambda match: (-match['similarity'], match['id']))
+        return results[:limit] if limit else results
+
+    def near_duplicates( self, threshold=0.8, kind=CLAIMS ):
+        ''' Every pair of publications having documents of <kind> at least <threshold> similar:
+            [(id, id, similarity), ...], most similar first.  Only documents sharing a bucket are compared. '''
+        self.__flush()
+
+        best = {}
+        for buckets in self.__buckets:
+            for documents_in_bucket in buckets.values():
+                members = [d for d in documents_in_bucket if kind is None or self.doc_kinds[d] == kind]
+                for i, document in enumerate(members[:-1]):
+                    others = members[i + 1:]
+                    similarities = (self.signatures[others] == self.signatures[document]).mean(axis=1)
+                    for other, similarity in zip(others, similarities.tolist()):
+                        a, b = self.doc_ids[document], self.doc_ids[other]
+                        if similarity < threshold or a == b:
+                            continue
+                        pair = (min(a, b), max(a, b))
+                        best[pair] = max(best.get(pair, 0.0), similarity)
+
+        pairs = [(self.ids[a], self.ids[b], similarity) for (a, b), similarity in best.items()]
+        return sorted(pairs, key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    #-----------------------------------------------------------------------
+    # Persistence
+    #-----------------------------------------------------------------------
+    def save( self, path ):
+        ''' Write the index to <path> (see indexfile.py) '''
+        np = _numpy()
+        self.__flush()
+        header = {'num_perm': self.num_perm, 'bands': self.bands, 'shingle_size': self.shingle_size,
+                  'seed': self.seed, 'ids': self.ids, 'doc_ids': self.doc_ids, 'doc_kinds': self.doc_kinds,
+                  'doc_labels': self.doc_labels}
+        write_index(path, header, [np.ascontiguousarray(self.signatures, dtype=np.uint32)])
+
+    @classmethod
+    def load( cls, path ):
+        np = _numpy()
+        header, (signatures,) = read_index(path, 'Similarity index')
+        index = cls(num_perm=header['num_perm'], bands=header['bands'], shingle_size=header['shingle_size'],
+                    seed=header['seed'])
+        index.ids = header['ids']
+        index.doc_ids = header['doc_ids']
+        index.doc_kinds = header['doc_kinds']
+        index.doc_labels = header['doc_labels']
+        signatures = np.frombuffer(signatures, dtype=np.uint32)
+        index.signatures = signatures.reshape(len(index.doc_ids), index.num_perm)
+
+        for document, signature in enumerate(index.signatures):
+            for band, key in enumerate(index.__band_keys(signature)):
+                index.__buckets[band][key].append(document)
+        return index
+
+
+def build_index( location, backend='directory', **options ):
+    ''' Build a SimilarityIndex over every publication in the store at <location> (see backends.open_backend) '''
+    return SimilarityIndex.build(PublicationStore(open_backend(backend, location)), **options)
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser(description='Build a MinHash/LSH similarity index of stored publications.')
+    parser.add_argument('--data', required=True, help='directory holding the publication store')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='directory',
+                        help="storage of --data: 'directory' (default) or 'sqlite' (then --data is the database file)")
+    parser.add_argument('--out', required=True, help='file to write the index to')
+    parser.add_argument('--duplicates', type=float, default=None, metavar='THRESHOLD',
+                        help='also print the publication pairs with independent claims at least this similar')
+    args = parser.parse_args(argv)
+
+    index = build_index(args.data, args.backend)
+    index.save(args.out)
+    print('indexed {0} documents of {1} publications to {2}'.format(len(index.doc_ids), len(index.ids), args.out))
+
+    if args.duplicates is not None:
+        for a, b, similarity in index.near_duplicates(args.duplicates):
+            print('{0}\t{1}\t{2:.3f}'.format(a, b, similarity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+""" Store - parsed publications (GooglePatentPublication.dict) kept as JSON records
+
+PublicationStore - records keyed by the validated publication number they were requested with
+"""
+
+import json
+
+
+class PublicationStore ( object ):
+    """ JSON records on top of a key/value backend (see backends.py) """
+
+    def __init__( self, backend ):
+        self.backend = backend
+
+    def get( self, pub_num ):
+        record = self.backend.get('publication/' + pub_num)
+        if record is None:
+            return None
+        return json.loads(record.decode('utf-8'))
+
+    def put( self, pub_num, record ):
+        self.backend.set('publication/' + pub_num, json.dumps(record, sort_keys=True).encode('utf-8'))
+
+    def delete( self, pub_num ):
+        self.backend.delete('publication/' + pub_num)
+
+    def keys( self ):
+        return [key[len('publication/'):] for key in self.backend.keys('publication/')]
+
+    def items( self ):
+        for pub_num in self.keys():
+            record = self.get(pub_num)
+            if record is not None:
+                yield pub_num, record
+
+    def __iter__( self ):
+        for pub_num, record in self.items():
+            yield record
+
+    def __contains__( self, pub_num ):
+        return self.backend.get('publication/' + pub_num) is not None
+
+    def __len__( self ):
+        return len(self.keys())
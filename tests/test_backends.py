@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+""" Tests for the storage backends, including their cross-process locks
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import fcntl
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import backends
+from backends import DirectoryBackend, SqliteBackend, open_backend
+
+WORKERS = 6
+INCREMENTS = 50
+
+
+def _open( kind, location, **options ):
+    return SqliteBackend(location, **options) if kind == 'sqlite' else DirectoryBackend(location)
+
+
+def _increment( kind, location ):
+    ''' Add INCREMENTS to the 'count' value, one unprotected read-modify-write at a time under the lock '''
+    backends.LOCK_POLL_INTERVAL = 0.001
+    backend = _open(kind, location)
+    done = 0
+    while done < INCREMENTS:
+        with backend.lock('fetch/US1', timeout=0.05) as acquired:
+            if not acquired:
+                continue
+            value = int(backend.get('count') or b'0')
+            time.sleep(0.0005)
+            backend.set('count', str(value + 1).encode())
+            done += 1
+
+
+def _hold( kind, location, seconds, held, lease=None ):
+    ''' Take the lock, report it through <held>, and keep it for <seconds> '''
+    backend = _open(kind, location, **({'lease': lease} if lease else {}))
+    with backend.lock('fetch/US1', timeout=5) as acquired:
+        assert acquired
+        held.set()
+        time.sleep(seconds)
+
+
+def _die_holding( kind, location, held, lease=None ):
+    ''' Take the lock and exit without releasing it '''
+    backend = _open(kind, location, **({'lease': lease} if lease else {}))
+    context = backend.lock('fetch/US1', timeout=5)
+    context.__enter__()
+    held.set()
+    os._exit(0)
+
+
+class BackendTestMixin ( object ):
+
+    kind = None
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3') if self.kind == 'sqlite' else self.directory
+        self.backend = open_backend(self.kind, self.location)
+
+    def tearDown( self ):
+        shutil.rmtree(self.directory)
+
+    def start( self, target, *args ):
+        process = multiprocessing.Process(target=target, args=(self.kind, self.location) + args)
+        process.start()
+        return process
+
+    def test_get_set_delete_keys( self ):
+        self.backend.set('html/US1', b'one')
+        self.backend.set('html/US2', b'two')
+        self.backend.set('parsed/US1', b'three')
+        self.assertEqual(self.backend.get('html/US1'), b'one')
+        self.assertIsNone(self.backend.get('html/US3'))
+        self.assertEqual(sorted(self.backend.keys('html/')), ['html/US1', 'html/US2'])
+        self.backend.delete('html/US1')
+        self.backend.delete('html/US1')
+        self.assertEqual(sorted(self.backend.keys()), ['html/US2', 'parsed/US1'])
+
+    def test_lock_is_exclusive_across_processes( self ):
+        processes = [self.start(_increment) for i in range(WORKERS)]
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.backend.get('count'), str(WORKERS * INCREMENTS).encode())
+
+    def test_lock_times_out_while_held( self ):
+        held = multiprocessing.Event()
+        process = self.start(_hold, 1.0, held)
+        self.assertTrue(held.wait(5))
+        with self.backend.lock('fetch/US1', timeout=0.2) as acquired:
+            self.assertFalse(acquired)
+        with self.backend.lock('fetch/US2', timeout=0.2) as acquired:
+            self.assertTrue(acquired)
+        process.join(5)
+        with self.backend.lock('fetch/US1', timeout=0.2) as acquired:
+            self.assertTrue(acquired)
+
+
+class DirectoryBackendTest ( BackendTestMixin, unittest.TestCase ):
+
+    kind = 'directory'
+
+    def test_lock_files_are_removed( self ):
+        self.test_lock_is_exclusive_across_processes()
+        self.assertEqual(os.listdir(os.path.join(self.directory, '.locks')), [])
+        self.assertEqual(list(self.backend.keys()), ['count'])
+
+    def test_lock_of_dead_holder_is_released( self ):
+        held = multiprocessing.Event()
+        process = self.start(_die_holding, held)
+        self.assertTrue(held.wait(5))
+        process.join(5)
+        with self.backend.lock('fetch/US1', timeout=0.5) as acquired:
+            self.assertTrue(acquired)
+
+    def test_waiter_retries_after_the_file_is_replaced( self ):
+        # A waiter blocked on the old lock file must not count as holding the lock once the holder removes that file
+        # and someone else locks the new one
+        directory = os.path.join(self.directory, '.locks')
+        os.makedirs(directory)
+        path = os.path.join(directory, 'fetch%2FUS1')
+        old = open(path, 'a')
+        fcntl.flock(old, fcntl.LOCK_EX)
+
+        state = {}
+        def wait():
+            with self.backend.lock('fetch/US1', timeout=5) as acquired:
+                state['acquired_at'] = time.monotonic()
+                state['acquired'] = acquired
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.2)                                     # the waiter now polls the old file
+
+        os.unlink(path)                                     # the holder's release: remove, then unlock
+        new = open(path, 'a')
+        fcntl.flock(new, fcntl.LOCK_EX)                     # a newcomer takes the new file first
+        fcntl.flock(old, fcntl.LOCK_UN)
+        old.close()
+        time.sleep(0.3)
+        self.assertNotIn('acquired', state)                 # it got the old file's flock, but must have retried
+
+        released_at = time.monotonic()
+        os.unlink(path)
+        fcntl.flock(new, fcntl.LOCK_UN)
+        new.close()
+        waiter.join(5)
+        self.assertTrue(state['acquired'])
+        self.assertGreaterEqual(state['acquired_at'], released_at)
+
+
+class SqliteBackendTest ( BackendTestMixin, unittest.TestCase ):
+
+    kind = 'sqlite'
+
+    def test_lease_is_renewed_while_held( self ):
+        # Held for several leases: a live holder keeps it
+        held = multiprocessing.Event()
+        process = self.start(_hold, 1.5, held, 0.3)
+        self.assertTrue(held.wait(5))
+        time.sleep(0.6)
+        with SqliteBackend(self.location, lease=0.3).lock('fetch/US1', timeout=0.5) as acquired:
+            self.assertFalse(acquired)
+        process.join(5)
+
+    def test_lease_of_dead_holder_runs_out( self ):
+        held = multiprocessing.Event()
+        process = self.start(_die_holding, held, 0.3)
+        self.assertTrue(held.wait(5))
+        process.join(5)
+        backend = SqliteBackend(self.location, lease=0.3)
+        with backend.lock('fetch/US1', timeout=0.1) as acquired:
+            self.assertFalse(acquired)
+        with backend.lock('fetch/US1', timeout=2) as acquired:
+            self.assertTrue(acquired)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+""" Tests for the parse result cache: encodings, versioning and purging
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import cache
+from backends import open_backend
+from cache import HtmlCache, ParsedCache
+
+BIBLIO = {'id': 'US1234567',
+          'title': 'Widget – café',
+          'inventors': ['John Smith', 'Taro Yamada'],
+          'claims': [{'number': 1, 'depends-from': None, 'elements': [{'text': 'A widget', 'elements': []}]}],
+          'classifications': {'us_classifications': ['123/45']},
+          'family_members': [],
+          'assignee': None,
+          'independent': True}
+
+
+class ParsedCacheMixin ( object ):
+
+    kind = None
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.location = os.path.join(self.directory, 'cache.sqlite3') if self.kind == 'sqlite' else self.directory
+        self.backend = open_backend(self.kind, self.location)
+        self.cache = ParsedCache(self.backend, version='v2')
+
+    def test_msgpack_round_trip( self ):
+        self.cache.put('US1234567', BIBLIO)
+        self.assertEqual(self.backend.get('parsed/v2/US1234567')[:1], ParsedCache.MSGPACK)
+        self.assertEqual(self.cache.get('US1234567'), BIBLIO)
+        self.assertIn('US1234567', self.cache)
+        self.assertIsNone(self.cache.get('US7654321'))
+
+    def test_marshal_round_trip( self ):
+        with mock.patch.object(cache, '_msgpack', lambda: None):
+            self.cache.put('US1234567', BIBLIO)
+            self.assertEqual(self.backend.get('parsed/v2/US1234567')[:1], ParsedCache.MARSHAL)
+            self.assertEqual(self.cache.get('US1234567'), BIBLIO)
+
+            # A msgpack entry can't be read without msgpack: a miss, not an error
+            self.backend.set('parsed/v2/US7654321', ParsedCache.MSGPACK + b'\x80')
+            self.assertIsNone(self.cache.get('US7654321'))
+
+        # ...while a marshal entry is still read with it
+        self.assertEqual(self.cache.get('US1234567'), BIBLIO)
+
+    def test_other_version_is_a_miss( self ):
+        ParsedCache(self.backend, version='v1').put('US1234567', BIBLIO)
+        self.assertIsNone(self.cache.get('US1234567'))
+        self.assertNotIn('US1234567', self.cache)
+
+        self.cache.put('US1234567', dict(BIBLIO, title='New'))
+        self.assertEqual(ParsedCache(self.backend, version='v1').get('US1234567')['title'], BIBLIO['title'])
+        self.assertEqual(self.cache.get('US1234567')['title'], 'New')
+
+    def test_purge_deletes_other_versions( self ):
+        for version in ('v1', 'v2', 'v3'):
+            ParsedCache(self.backend, version=version).put('US1234567', BIBLIO)
+        ParsedCache(self.backend, version='v1').put('US7654321', BIBLIO)
+        HtmlCache(self.backend).put('US1234567', '<html></html>')
+
+        self.assertEqual(self.cache.purge(), 3)
+        self.assertEqual(sorted(self.backend.keys()), ['html/US1234567', 'meta/US1234567', 'parsed/v2/US1234567'])
+        self.assertEqual(self.cache.get('US1234567'), BIBLIO)
+        self.assertEqual(self.cache.purge(), 0)
+
+    def test_refresh_purges( self ):
+        import refresh
+
+        ParsedCache(self.backend, version='v1').put('US1234567', BIBLIO)
+        with mock.patch.object(sys, 'stderr'):
+            refresh.main(['--data', self.location, '--backend', self.kind])
+        self.assertEqual(list(self.backend.keys('parsed/')), [])
+
+
+class DirectoryParsedCacheTest ( ParsedCacheMixin, unittest.TestCase ):
+
+    kind = 'directory'
+
+
+class SqliteParsedCacheTest ( ParsedCacheMixin, unittest.TestCase ):
+
+    kind = 'sqlite'
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+""" Tests for classification code parsing, key packing and the prefix index
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import classification
+from classification import (CPC, US, SUBCLASS, MAIN_GROUP, ClassificationIndex, format_key,
+                            parse_code, prefix_range)
+
+RECORDS = [{'id': 'US1', 'classifications': {CPC: ['H04L 9/3247', 'H04L 63/08'], US: ['713/168']}},
+           {'id': 'US2', 'classifications': {CPC: ['H04L9/32', 'G06F 21/00'], US: ['713/176', '713/168.5']}},
+           {'id': 'USD3', 'classifications': {US: ['D14/341']}},
+           {'id': 'USPP4', 'classifications': {US: ['PLT14/341', 'PLT 263']}},
+           {'id': 'US5', 'classifications': {CPC: ['H04W 12/06', 'not a code'], US: ['14/341']}}]
+
+
+def within( key, bounds ):
+    return bounds[0] <= key < bounds[1]
+
+
+class ParseCodeTest ( unittest.TestCase ):
+
+    def test_cpc( self ):
+        code = parse_code('H04L 9/3247')
+        self.assertEqual((code.section, code.class_, code.subclass, code.main_group, code.subgroup),
+                         ('H', '04', 'L', '9', '3247'))
+        self.assertEqual(code.level, classification.SUBGROUP)
+        self.assertEqual(parse_code('h04l9/3247').key, code.key)
+        self.assertEqual(parse_code('H04L').level, SUBCLASS)
+        self.assertIsNone(parse_code('not a code'))
+
+    def test_us_kinds_are_distinct( self ):
+        utility, design, plant = [parse_code(code, US) for code in ('14/341', 'D14/341', 'PLT14/341')]
+        self.assertEqual((utility.class_, design.class_, plant.class_), ('14', 'D14', 'PLT14'))
+        self.assertEqual(len({utility.key, design.key, plant.key}), 3)
+        self.assertEqual(parse_code('plt 14/341', US).key, plant.key)
+
+    def test_us_decimals( self ):
+        code = parse_code('713/168.5', US)
+        self.assertEqual((code.class_, code.subclass, code.subgroup), ('713', '168', '5'))
+        self.assertEqual(code.level, 2)
+
+    def test_format_key( self ):
+        self.assertEqual(format_key(parse_code('H04L 9/3247').key, MAIN_GROUP), 'H04L 9/')
+        self.assertEqual(format_key(parse_code('H04L 9/3247').key, classification.SUBGROUP), 'H04L 9/3247')
+        self.assertEqual(format_key(parse_code('H04L 9/00').key, classification.SUBGROUP), 'H04L 9/00')
+        self.assertEqual(format_key(parse_code('PLT14/341', US).key, 1, US), 'PLT14/341')
+        self.assertEqual(format_key(parse_code('D14/341', US).key, 0, US), 'D14')
+        self.assertEqual(format_key(parse_code('713/168.5', US).key, 2, US), '713/168.5')
+
+
+class PrefixRangeTest ( unittest.TestCase ):
+
+    def test_cpc_levels( self ):
+        key = parse_code('H04L 9/3247').key
+        for prefix in ('H', 'H04', 'H04L', 'H04L 9/', 'H04L9', 'H04L 9/3', 'H04L 9/32', 'H04L 9/3247'):
+            self.assertTrue(within(key, prefix_range(prefix)), prefix)
+        for prefix in ('G', 'H04W', 'H04L 93/', 'H04L 9/33', 'H04L 9/325'):
+            self.assertFalse(within(key, prefix_range(prefix)), prefix)
+
+    def test_us_kinds( self ):
+        design = parse_code('D14/341', US).key
+        plant = parse_code('PLT14/341', US).key
+        utility = parse_code('14/341', US).key
+        self.assertTrue(within(plant, prefix_range('PLT14', US)))
+        self.assertFalse(within(design, prefix_range('PLT14', US)))
+        self.assertFalse(within(utility, prefix_range('PLT14', US)))
+        self.assertTrue(within(design, prefix_range('D14/', US)))
+        self.assertFalse(within(plant, prefix_range('D14/', US)))
+
+    def test_invalid( self ):
+        self.assertIsNone(prefix_range('no such prefix'))
+        self.assertIsNone(prefix_range('X14', US))
+
+
+class ClassificationIndexTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.index = ClassificationIndex.build(RECORDS)
+
+    def test_lookup( self ):
+        self.assertEqual(self.index.lookup('H04L 9/32'), ['US1', 'US2'])
+        self.assertEqual(self.index.lookup('H04L 63/'), ['US1'])
+        self.assertEqual(self.index.lookup('PLT14', US), ['USPP4'])
+        self.assertEqual(self.index.lookup('D14', US), ['USD3'])
+        self.assertEqual(self.index.lookup('14', US), ['US5'])
+        self.assertEqual(self.index.count('H04', CPC), 3)
+        self.assertRaises(ValueError, self.index.lookup, 'no such prefix')
+
+    def test_subtree_counts( self ):
+        self.assertEqual(self.index.subtree_counts('H04', SUBCLASS), {'H04L': 2, 'H04W': 1})
+        self.assertEqual(self.index.subtree_counts('H04L', MAIN_GROUP), {'H04L 9/': 2, 'H04L 63/': 1})
+        # A publication is counted once per subtree, however many of its codes fall in it
+        self.assertEqual(self.index.subtree_counts('713', 1, US), {'713/168': 2, '713/176': 1})
+
+    def test_us_kinds_are_counted_apart( self ):
+        counts = {}
+        for prefix in ('14', 'D14', 'PLT14', 'PLT263'):
+            counts.update(self.index.subtree_counts(prefix, 0, US))
+        self.assertEqual(counts, {'14': 1, 'D14': 1, 'PLT14': 1, 'PLT263': 1})
+
+    def test_save_load( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'classification.idx')
+            self.index.save(path)
+            loaded = ClassificationIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(loaded.ids, self.index.ids)
+        self.assertEqual(loaded.keys, self.index.keys)
+        self.assertEqual(loaded.postings, self.index.postings)
+        self.assertEqual(loaded.lookup('PLT14', US), ['USPP4'])
+        self.assertEqual(loaded.subtree_counts('H04L', MAIN_GROUP), {'H04L 9/': 2, 'H04L 63/': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+""" Tests for fetching pages, including the streaming of oversized ones
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import extraction
+import transport
+from backends import DirectoryBackend
+from cache import HtmlCache
+from extraction import fetch_page
+from patentapi import load_publication
+from refresh import CHANGED, refresh_publication
+from store import PublicationStore
+from transport import Response, _headers
+
+PARAGRAPH = '<p>' + 'A long description of the widget. ' * 4 + '</p>'
+CLAIM = ('<div class="claim"><div num="1" class="claim"><div class="claim-text">1. A widget made of café au lait.</div>'
+         '</div></div>')
+
+
+def page( paragraphs ):
+    return ('<html><head><meta name="DC.title" content="Widget"></head><body>'
+            '<table class="patent-bibdata"><tr><td class="patent-bibdata-heading">Inventors</td>'
+            '<td>John Smith</td></tr></table>'
+            + PARAGRAPH * paragraphs +
+            '<div class="claims">' + CLAIM + '</div></body></html>').encode('utf-8')
+
+
+class Stream ( io.BytesIO ):
+    ''' A response body that records how it is read '''
+
+    def __init__( self, body ):
+        io.BytesIO.__init__(self, body)
+        self.reads = []
+
+    def read( self, size=-1 ):
+        self.reads.append(size)
+        return io.BytesIO.read(self, size)
+
+
+class StreamingTransport ( object ):
+    ''' Serves <body> for every URL as a live transport would with stream=True '''
+
+    def __init__( self, body, content_length=True ):
+        self.body = body
+        self.content_length = content_length
+        self.streams = []
+
+    def request( self, url, headers=None, method='GET', stream=False ):
+        items = [('Content-Type', 'text/html; charset=utf-8'), ('ETag', '"2"')]
+        if self.content_length:
+            items.append(('Content-Length', str(len(self.body))))
+        self.streams.append(Stream(self.body))
+        return Response(url, 200, _headers(items), None, stream=self.streams[-1])
+
+
+class FetchTestCase ( unittest.TestCase ):
+
+    def setUp( self ):
+        patches = [mock.patch.object(extraction, 'SOUP_SIZE_LIMIT', 2000),
+                   mock.patch.object(extraction, 'STREAM_CHUNK_SIZE', 101)]     # splits the 'é' in some chunk
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(transport.set_transport, None)
+
+    def fetch( self, body, content_length=True ):
+        self.transport = StreamingTransport(body, content_length)
+        transport.set_transport(self.transport)
+        return fetch_page('US1234567')
+
+
+class FetchPageTest ( FetchTestCase ):
+
+    def test_small_page_is_complete( self ):
+        status, headers, html, complete = self.fetch(page(2))
+        self.assertEqual(status, 200)
+        self.assertTrue(complete)
+        self.assertIn('A long description', html)
+        self.assertIn('café au lait', html)
+
+    def test_oversized_page_is_streamed( self ):
+        for content_length in (True, False):
+            status, headers, html, complete = self.fetch(page(100), content_length)
+            self.assertFalse(complete)
+            self.assertNotIn('A long description', html)
+            self.assertIn('DC.title', html)
+            self.assertIn('café au lait', html)
+            self.assertIn('John Smith', html)
+
+            # Read a chunk at a time, never whole, and closed afterwards
+            stream = self.transport.streams[-1]
+            self.assertTrue(stream.closed)
+            self.assertEqual(set(stream.reads), {extraction.STREAM_CHUNK_SIZE})
+
+    def test_content_length_over_the_limit_is_not_buffered( self ):
+        # With the length known, nothing is buffered before the skeleton parser starts
+        fed = []
+        skeleton_html = extraction.skeleton_html
+        def skeleton( chunks ):
+            fed.append(len(self.transport.streams[-1].reads))
+            return skeleton_html(chunks)
+
+        with mock.patch.object(extraction, 'skeleton_html', skeleton):
+            self.fetch(page(100))
+        self.assertEqual(fed, [0])
+
+
+class CachingTest ( FetchTestCase ):
+
+    def setUp( self ):
+        FetchTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        backend = DirectoryBackend(self.directory)
+        self.html_cache = HtmlCache(backend)
+        self.store = PublicationStore(backend)
+
+    def load( self, body ):
+        transport.set_transport(StreamingTransport(body))
+        return load_publication('US1234567', html_cache=self.html_cache)
+
+    def test_reduced_page_is_not_cached( self ):
+        pat = self.load(page(100))
+        self.assertEqual(pat.biblio['inventors'], ['John Smith'])
+        self.assertIsNone(self.html_cache.get('US1234567'))
+
+        self.load(page(2))
+        self.assertEqual(self.html_cache.get('US1234567')['etag'], '"2"')
+
+    def test_refresh_drops_a_page_that_outgrew_the_limit( self ):
+        self.html_cache.put('US1234567', page(2).decode('utf-8'), etag='"1"')
+        transport.set_transport(StreamingTransport(page(100)))
+        outcome, changes = refresh_publication('US1234567', self.html_cache, self.store)
+        self.assertEqual(outcome, CHANGED)
+        self.assertEqual(self.store.get('US1234567')['inventors'], ['John Smith'])
+        self.assertIsNone(self.html_cache.get_meta('US1234567'))
+
+
+if __name__ == "__main__":
+    unittest.main()
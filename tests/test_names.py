@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+""" Tests for assignee/inventor canonicalization and the portfolio index
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from names import NameIndex, NameTable, canonical_assignee, canonical_inventor
+
+RECORDS = [{'id': 'US1', 'assignee': 'International Business Machines Corp.', 'inventors': ['Smith, John A.']},
+           {'id': 'US2', 'assignee': 'IBM', 'inventors': ['John Smith', 'J. Smith']},
+           {'id': 'US3', 'assignee': 'Kabushiki Kaisha Toshiba', 'inventors': ['Taro Yamada']},
+           {'id': 'US4', 'assignee': 'Toshiba Corp', 'inventors': ['Yamada, Taro', 'Smith, J.']},
+           {'id': 'US5', 'assignee': 'INTERNATIONAL BUSINESS MACHINES CORPORATION', 'inventors': [],
+            'assignee_canonical': 'INTERNATIONAL BUSINESS MACHINES'},
+           {'id': 'US6', 'assignee': None, 'inventors': None}]
+
+ALIASES = {'assignee': {'IBM': 'International Business Machines'},
+           'inventors': {'Taro Yamada': 'Yamada Taro'}}
+
+
+class CanonicalAssigneeTest ( unittest.TestCase ):
+
+    def assertSame( self, *names ):
+        self.assertEqual(len({canonical_assignee(name) for name in names}), 1, names)
+
+    def test_suffixes( self ):
+        self.assertEqual(canonical_assignee('International Business Machines Corp.'),
+                         'INTERNATIONAL BUSINESS MACHINES')
+        self.assertSame('Samsung Electronics Co., Ltd.', 'SAMSUNG ELECTRONICS CO LTD', 'Samsung Electronics')
+        self.assertSame('Siemens Aktiengesellschaft', 'Siemens AG', 'SIEMENS')
+        self.assertSame('Robert Bosch Gesellschaft mit beschränkter Haftung', 'Robert Bosch GmbH')
+
+    def test_prefixes( self ):
+        self.assertSame('Kabushiki Kaisha Toshiba', 'Toshiba Corp', 'Toshiba Kabushiki Kaisha')
+        self.assertSame('The Boeing Company', 'Boeing Co')
+
+    def test_name_is_never_stripped_away( self ):
+        self.assertEqual(canonical_assignee('Co-Co Inc'), 'CO CO')
+        self.assertEqual(canonical_assignee('Inc'), 'INC')
+        self.assertEqual(canonical_assignee('The Company'), 'THE COMPANY')
+
+    def test_folding( self ):
+        self.assertEqual(canonical_assignee('Nestlé S.A.'), 'NESTLE')
+        self.assertEqual(canonical_assignee('AT&T Corp'), 'AT AND T')
+        self.assertIsNone(canonical_assignee(''))
+        self.assertIsNone(canonical_assignee(None))
+
+
+class CanonicalInventorTest ( unittest.TestCase ):
+
+    def test_full_given_name( self ):
+        for name in ('John Smith', 'John A. Smith', 'Smith, John A.', 'Smith, John A., Jr.', 'JOHN SMITH III'):
+            self.assertEqual(canonical_inventor(name), 'JOHN SMITH', name)
+
+    def test_initials_are_kept_without_a_given_name( self ):
+        self.assertEqual(canonical_inventor('J. Smith'), 'J SMITH')
+        self.assertEqual(canonical_inventor('Smith, J.'), 'J SMITH')
+        self.assertEqual(canonical_inventor('O. J. Simpson'), 'O J SIMPSON')
+        self.assertNotEqual(canonical_inventor('J. Smith'), canonical_inventor('A. Smith'))
+
+    def test_other( self ):
+        self.assertEqual(canonical_inventor('José García-López'), 'JOSE GARCIA LOPEZ')
+        self.assertEqual(canonical_inventor('Smith'), 'SMITH')
+        self.assertIsNone(canonical_inventor(''))
+
+
+class NameTableTest ( unittest.TestCase ):
+
+    def test_intern_and_aliases( self ):
+        table = NameTable(canonical_assignee, {'IBM': 'International Business Machines Corp'})
+        first = table.intern('International Business Machines Corp.')
+        self.assertEqual(table.intern('IBM'), first)
+        self.assertEqual(table.intern('I.B.M.'), table.intern('IBM Inc'))
+        self.assertEqual(table.lookup('INTERNATIONAL BUSINESS MACHINES CORPORATION'), first)
+        self.assertIsNone(table.lookup('Toshiba'))
+        # 'I.B.M.' and 'IBM Inc' fold to 'IBM', so the alias covers them too
+        self.assertEqual(table.variants('IBM'),
+                         ['I.B.M.', 'IBM', 'IBM Inc', 'International Business Machines Corp.'])
+
+
+class NameIndexTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.index = NameIndex.build(RECORDS, ALIASES)
+
+    def test_portfolio_and_count( self ):
+        self.assertEqual(self.index.portfolio('IBM'), ['US1', 'US2', 'US5'])
+        self.assertEqual(self.index.count('International Business Machines'), 3)
+        self.assertEqual(self.index.portfolio('Toshiba'), ['US3', 'US4'])
+        self.assertEqual(self.index.portfolio('Unknown Corp'), [])
+        self.assertEqual(self.index.count('Unknown Corp'), 0)
+
+        self.assertEqual(self.index.portfolio('John Smith', 'inventors'), ['US1', 'US2'])
+        self.assertEqual(self.index.portfolio('J. Smith', 'inventors'), ['US2', 'US4'])
+        self.assertEqual(self.index.count('Taro Yamada', 'inventors'), 2)
+
+    def test_aliases_are_per_kind( self ):
+        # The assignee alias doesn't apply to inventors, nor the inventor alias to assignees
+        self.assertEqual(self.index.canonical('Taro Yamada', 'inventors'), 'YAMADA TARO')
+        self.assertIsNone(self.index.canonical('IBM', 'inventors'))
+        self.assertIsNone(self.index.canonical('Taro Yamada', 'assignee'))
+
+    def test_top( self ):
+        self.assertEqual(self.index.top(2), [('INTERNATIONAL BUSINESS MACHINES', 3), ('TOSHIBA', 2)])
+
+    def test_save_load( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'names.idx')
+            self.index.save(path)
+            loaded = NameIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(loaded.ids, self.index.ids)
+        for kind in NameIndex.KINDS:
+            self.assertEqual(loaded.keys[kind], self.index.keys[kind])
+            self.assertEqual(loaded.postings[kind], self.index.postings[kind])
+            self.assertEqual(loaded.counts[kind], self.index.counts[kind])
+        self.assertEqual(loaded.portfolio('IBM'), ['US1', 'US2', 'US5'])
+        self.assertEqual(loaded.count('J. Smith', 'inventors'), 2)
+        self.assertEqual(loaded.top(2), self.index.top(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
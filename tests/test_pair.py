@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+""" Tests for the PAIR member parsers, on sample members of application 12/345,678 in fixtures/pair
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import io
+import os
+import re
+import sys
+import unittest
+import zipfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import pair
+import transport
+
+FIXTURES = os.path.join(HERE, 'fixtures', 'pair')
+APPLICATION = '12345678'
+
+
+def fixture_path( member ):
+    return os.path.join(FIXTURES, APPLICATION + '-' + member + '.tsv')
+
+
+def fixture_lines( member ):
+    # Decoded as pair._member_lines does, keeping the '\r\n' line ends of the archive
+    with open(fixture_path(member), encoding='latin-1', newline='') as f:
+        return list(f)
+
+
+class RangeTransport ( object ):
+    ''' Serves <data> for every URL, answering Range requests with 206 as the storage host does '''
+
+    def __init__( self, data ):
+        self.data = data
+        self.requests = 0
+
+    def request( self, url, headers=None, method='GET' ):
+        self.requests += 1
+        size = len(self.data)
+        if method == 'HEAD':
+            return transport.Response(url, 200, transport._headers([('Content-Length', str(size))]), b'')
+        start, end = [int(n) for n in re.match(r'bytes=(\d+)-(\d+)', headers['Range']).groups()]
+        end = min(end, size - 1)
+        content_range = 'bytes %d-%d/%d' % (start, end, size)
+        return transport.Response(url, 206, transport._headers([('Content-Range', content_range)]),
+                                  self.data[start:end + 1])
+
+
+class ParserTest ( unittest.TestCase ):
+
+    def test_application_data( self ):
+        data = pair.parse_application_data(fixture_lines(pair.APPLICATION_DATA))
+        self.assertEqual(data['status'], 'Patented Case')
+        self.assertEqual(data['status_date'], '2012-08-21')
+        # Keys are the same with or without a trailing ':'
+        self.assertEqual(data['Filing or 371 (c) Date'], '2011-03-14')
+        self.assertEqual(data['Issue Date of Patent'], '2012-08-14')
+        self.assertEqual(data['Patent Number'], '8,245,678')
+        self.assertFalse([key for key in data if key.endswith(':')])
+
+    def test_transaction_history( self ):
+        transactions = pair.parse_transaction_history(fixture_lines(pair.TRANSACTION_HISTORY))
+        self.assertEqual(len(transactions), 7)
+        self.assertEqual(transactions[0], {'date': '2012-08-21', 'description': 'Email Notification'})
+        self.assertEqual(transactions[-1]['date'], '2011-03-14')
+        self.assertTrue(pair.terminal_disclaimer(transactions))
+
+    def test_patent_term_adjustment( self ):
+        pta = pair.parse_patent_term_adjustment(fixture_lines(pair.PATENT_TERM_ADJUSTMENT))
+        self.assertEqual(pta['total_days'], 81)
+        self.assertEqual(pta['summary']['A Delays'], '112')
+        self.assertEqual(pta['summary']['Issue Date of Patent'], '2012-08-14')
+        self.assertEqual(len(pta['history']), 3)
+        self.assertEqual(pta['history'][1]['Contents Description'], 'Response after Non-Final Action')
+        self.assertEqual(pta['history'][1]['APPL(Days)'], '31')
+        self.assertEqual(pta['history'][1]['Start'], '2011-10-03')
+
+    def test_continuity_data( self ):
+        continuity = pair.parse_continuity_data(fixture_lines(pair.CONTINUITY_DATA))
+        self.assertEqual(len(continuity['parents']), 1)
+        self.assertEqual(continuity['parents'][0]['Parent Number'], '61/312,345')
+        self.assertEqual(continuity['parents'][0]['Parent Filing or 371(c) Date'], '2010-03-15')
+        self.assertEqual(len(continuity['children']), 1)
+        self.assertEqual(continuity['children'][0]['Patent Number'], '8,765,432')
+
+
+class ExtractPairTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+            for member in pair.MEMBERS:
+                z.write(fixture_path(member), APPLICATION + '/' + APPLICATION + '-' + member + '.tsv')
+        transport.set_transport(RangeTransport(archive.getvalue()))
+
+    def tearDown( self ):
+        transport.set_transport(None)
+
+    def test_extract_pair( self ):
+        result = pair.extract_pair('US 12/345,678')
+        self.assertEqual(sorted(result), sorted(pair.MEMBERS))
+        self.assertEqual(result[pair.APPLICATION_DATA],
+                         pair.parse_application_data(fixture_lines(pair.APPLICATION_DATA)))
+        self.assertEqual(result[pair.PATENT_TERM_ADJUSTMENT]['total_days'], 81)
+
+    def test_publication_status( self ):
+        self.assertEqual(pair.publication_status('12/345,678'), 'Patented Case')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+""" Tests for the background prefetcher
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import sqlite3
+import sys
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from prefetch import Prefetcher, FAMILY, CITATION
+
+
+def wait_for_queue( prefetcher, timeout=5 ):
+    ''' Wait until every queued entry was handled; False if that took longer than <timeout> seconds '''
+    deadline = time.monotonic() + timeout
+    while prefetcher.queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class PrefetcherTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.loaded = []
+        self.prefetcher = None
+
+    def tearDown( self ):
+        if self.prefetcher:
+            self.prefetcher.stop(5)
+
+    def start( self, **options ):
+        self.prefetcher = Prefetcher(self.loaded.append, **options)
+        self.prefetcher.start()
+        return self.prefetcher
+
+    def test_bad_entries_dont_end_the_thread( self ):
+        def is_cached( pub_num ):
+            if pub_num == 'US1':
+                raise sqlite3.OperationalError('database is locked')
+            if pub_num == 'US2':
+                raise TypeError("argument of type 'bool' is not iterable")     # as for an invalid number
+            return pub_num == 'US3'
+
+        prefetcher = self.start(is_cached=is_cached)
+        for pub_num in ('US1', 'US2', 'US3', 'US4'):
+            prefetcher.enqueue(pub_num)
+        self.assertTrue(wait_for_queue(prefetcher))
+        self.assertEqual(self.loaded, ['US4'])
+
+    def test_failed_load_is_skipped( self ):
+        def load( pub_num ):
+            if pub_num == 'US1':
+                raise IOError('upstream failed')
+            self.loaded.append(pub_num)
+
+        self.prefetcher = Prefetcher(load)
+        self.prefetcher.start()
+        self.prefetcher.enqueue('US1')
+        self.prefetcher.enqueue('US2')
+        self.assertTrue(wait_for_queue(self.prefetcher))
+        self.assertEqual(self.loaded, ['US2'])
+        self.assertEqual(self.prefetcher.loaded, 1)
+
+    def test_enqueue_related( self ):
+        prefetcher = Prefetcher(self.loaded.append, per_publication=3)
+        record = {'family_members': ['US10', 'US11'],
+                  'backward_citations': [{'publication_number': 'US20'}, {'publication_number': 'US21'}]}
+        self.assertEqual(prefetcher.enqueue_related(record), 3)
+        self.assertFalse(prefetcher.enqueue('US10'))        # queued recently
+        queued = [prefetcher.queue.get_nowait() for i in range(3)]
+        self.assertEqual([(priority, pub_num) for priority, sequence, pub_num in queued],
+                         [(FAMILY, 'US10'), (FAMILY, 'US11'), (CITATION, 'US20')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+""" Tests for MinHash signatures and the LSH similarity index
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from extraction import claim_text
+from similarity import ABSTRACT, CLAIMS, SimilarityIndex, documents
+
+WIDGET = ('A widget comprising a housing, a spring mounted inside the housing, a lever coupled to the spring, '
+          'and a latch that holds the lever against the spring until a button on the housing is pressed')
+GADGET = ('A method of brewing coffee comprising grinding roasted beans, heating water to a set temperature, '
+          'passing the water through the ground beans and collecting the brewed coffee in a carafe')
+
+
+def claim( number, text, depends_from=None ):
+    # Split in two elements, as BuildClaimElement would for a claim with a sub-element
+    words = text.split(' ')
+    middle = len(words) // 2
+    return {'number': number, 'depends-from': depends_from,
+            'elements': [{'text': ' '.join(words[:middle]),
+                          'children': [{'text': ' '.join(words[middle:]), 'children': []}]}]}
+
+
+RECORDS = [{'id': 'US1', 'claims': [claim(1, WIDGET), claim(2, 'The widget of claim 1, made of steel', 1)],
+            'abstract': GADGET},
+           {'id': 'US2', 'claims': [claim(1, WIDGET.replace('pressed', 'pushed'))], 'abstract': None},
+           {'id': 'US3', 'claims': [claim(1, GADGET)], 'abstract': 'An unrelated abstract about bicycles'},
+           {'id': 'US4', 'claims': [], 'abstract': None}]
+
+
+class ClaimTextTest ( unittest.TestCase ):
+
+    def test_flattened_depth_first( self ):
+        tree = {'elements': [{'text': 'A widget comprising:', 'children': [{'text': 'a housing;', 'children': []},
+                                                                           {'text': '', 'children': []}]},
+                             {'text': 'a spring.', 'children': []}]}
+        self.assertEqual(claim_text(tree), 'A widget comprising: a housing; a spring.')
+        self.assertEqual(claim_text({'elements': []}), '')
+        self.assertEqual(claim_text(RECORDS[0]['claims'][0]), WIDGET)
+
+    def test_documents( self ):
+        self.assertEqual([(kind, label) for kind, label, text in documents(RECORDS[0])],
+                         [(CLAIMS, 'claim 1'), (ABSTRACT, ABSTRACT)])
+        self.assertEqual(list(documents(RECORDS[3])), [])
+
+
+class SignatureTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.index = SimilarityIndex()
+
+    def test_signature( self ):
+        signature = self.index.signature(WIDGET)
+        self.assertEqual((signature.dtype.name, len(signature)), ('uint32', self.index.num_perm))
+        self.assertEqual(list(signature), list(self.index.signature(WIDGET.upper() + '.')))   # case and punctuation
+        self.assertEqual(list(signature), list(SimilarityIndex().signature(WIDGET)))         # same seed
+        self.assertNotEqual(list(signature), list(SimilarityIndex(seed=2).signature(WIDGET)))
+        self.assertIsNone(self.index.signature(' ... '))
+
+    def test_estimates_jaccard_similarity( self ):
+        def estimate( a, b ):
+            return (self.index.signature(a) == self.index.signature(b)).mean()
+
+        def jaccard( a, b ):
+            a, b = set(self.index.shingles(a).tolist()), set(self.index.shingles(b).tolist())
+            return len(a & b) / len(a | b)
+
+        near = WIDGET.replace('pressed', 'pushed')
+        self.assertEqual(estimate(WIDGET, WIDGET), 1.0)
+        self.assertAlmostEqual(estimate(WIDGET, near), jaccard(WIDGET, near), delta=0.15)
+        self.assertLess(estimate(WIDGET, GADGET), 0.1)
+
+
+class SimilarityIndexTest ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.index = SimilarityIndex.build(RECORDS)
+
+    def test_query( self ):
+        results = self.index.query(RECORDS[1], threshold=0.5)
+        self.assertEqual([match['id'] for match in results], ['US1'])
+        self.assertEqual([(m['part'], m['matched']) for m in results[0]['matches']], [('claim 1', 'claim 1')])
+        self.assertGreater(results[0]['similarity'], 0.8)
+
+        # Claims are matched against claims and abstracts against abstracts; kind=None queries both
+        abstract = {'id': 'US9', 'claims': [], 'abstract': GADGET}
+        self.assertEqual(self.index.query(abstract, kind=CLAIMS), [])
+        found = self.index.query(abstract, kind=None)
+        self.assertEqual([(match['id'], match['similarity']) for match in found], [('US1', 1.0)])
+        self.assertEqual(found[0]['matches'], [{'part': ABSTRACT, 'matched': ABSTRACT, 'similarity': 1.0}])
+
+        # Best first
+        widget = {'id': 'US9', 'claims': [claim(1, WIDGET)]}
+        self.assertEqual([match['id'] for match in self.index.query(widget, threshold=0.5)], ['US1', 'US2'])
+        self.assertEqual([match['id'] for match in self.index.query(widget, threshold=0.5, limit=1)], ['US1'])
+
+    def test_query_leaves_out_the_record_itself( self ):
+        self.assertEqual([match['id'] for match in self.index.query(RECORDS[0], threshold=0.5)], ['US2'])
+
+    def test_near_duplicates( self ):
+        pairs = self.index.near_duplicates(threshold=0.5)
+        self.assertEqual([(a, b) for a, b, similarity in pairs], [('US1', 'US2')])
+        self.assertEqual(self.index.near_duplicates(threshold=0.5, kind=ABSTRACT), [])
+        self.assertEqual([(a, b) for a, b, similarity in self.index.near_duplicates(kind=None)],
+                         [('US1', 'US3'), ('US1', 'US2')])
+
+    def test_save_load( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'similarity.idx')
+            self.index.save(path)
+            loaded = SimilarityIndex.load(path)
+
+            with open(path, 'wb') as f:
+                f.write(b'{"num_perm": 128}\n')
+            self.assertRaises(ValueError, SimilarityIndex.load, path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(loaded.ids, self.index.ids)
+        self.assertEqual(loaded.doc_labels, self.index.doc_labels)
+        self.assertEqual(loaded.signatures.tolist(), self.index.signatures.tolist())
+        self.assertEqual(loaded.query(RECORDS[1], threshold=0.5), self.index.query(RECORDS[1], threshold=0.5))
+        self.assertEqual(loaded.near_duplicates(kind=None), self.index.near_duplicates(kind=None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+""" Tests for recording and replaying upstream responses
+
+    python -m unittest discover tests       (or: python -m pytest tests)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import transport
+from transport import RecordingTransport, ReplayMiss, ReplayTransport, Response, _headers
+
+PAGE = 'https://www.google.com/patents/US%d'
+PAGES = [PAGE % number for number in range(40)]
+
+
+class Upstream ( object ):
+    ''' Answers every URL with a body naming the request, and Range requests with 206 '''
+
+    def __init__( self ):
+        self.requests = 0
+
+    def request( self, url, headers=None, method='GET' ):
+        self.requests += 1
+        headers = headers or {}
+        if headers.get('If-None-Match') == '"1"':
+            return Response(url, 304, _headers([('ETag', '"1"')]), b'')
+        if headers.get('Range'):
+            return Response(url, 206, _headers([('Content-Range', headers['Range'].replace('=', ' ') + '/100')]),
+                            ('%s %s' % (url, headers['Range'])).encode())
+        return Response(url, 200, _headers([('Content-Type', 'text/html; charset=utf-8'), ('ETag', '"1"')]),
+                        ('%s %s' % (method, url)).encode())
+
+
+class RecordedTestCase ( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.upstream = Upstream()
+        recorder = RecordingTransport(self.directory, inner=self.upstream)
+        self.recorded = {}
+        for url in PAGES:
+            self.recorded[url] = recorder.request(url)
+        self.recorded['range'] = recorder.request(PAGES[0], headers={'Range': 'bytes=0-9'})
+        self.recorded['304'] = recorder.request(PAGES[0], headers={'If-None-Match': '"1"'})
+
+    def tearDown( self ):
+        shutil.rmtree(self.directory)
+
+
+class RoundTripTest ( RecordedTestCase ):
+
+    def test_replay_matches_recording( self ):
+        replay = ReplayTransport(self.directory)
+        requests = self.upstream.requests
+        for url in PAGES:
+            response = replay.request(url)
+            self.assertEqual((response.status, response.body), (200, self.recorded[url].body))
+            self.assertEqual(response.headers.get_content_charset(), 'utf-8')
+            self.assertEqual(response.headers.get('ETag'), '"1"')
+        self.assertEqual(self.upstream.requests, requests)          # nothing went upstream
+
+    def test_request_headers_are_part_of_the_key( self ):
+        replay = ReplayTransport(self.directory)
+        ranged = replay.request(PAGES[0], headers={'Range': 'bytes=0-9'})
+        self.assertEqual((ranged.status, ranged.body), (206, self.recorded['range'].body))
+        self.assertEqual(ranged.headers['Content-Range'], 'bytes 0-9/100')
+        self.assertEqual(replay.request(PAGES[0], headers={'If-None-Match': '"1"'}).status, 304)
+        self.assertRaises(ReplayMiss, replay.request, PAGES[0], headers={'Range': 'bytes=10-19'})
+        self.assertRaises(ReplayMiss, replay.request, PAGES[0], method='HEAD')
+
+    def test_replay_through_the_pipeline( self ):
+        from extraction import fetch_page
+
+        transport.set_transport(ReplayTransport(self.directory))
+        try:
+            status, headers, html, complete = fetch_page('US1')
+        finally:
+            transport.set_transport(None)
+        self.assertEqual(status, 200)
+        self.assertTrue(complete)
+        self.assertIn('US1', html)
+
+
+class ReproducibilityTest ( RecordedTestCase ):
+
+    def outcomes( self, seed, order, workers=1, rounds=3 ):
+        ''' {url: sorted outcomes} for requesting <order> <rounds> times; an outcome is the delay or 'failed' '''
+        replay = ReplayTransport(self.directory, jitter=0.5, error_rate=0.3, seed=seed)
+        delays = {}
+        local = threading.local()
+
+        def sleep( seconds ):
+            local.delay = seconds
+
+        def run( url ):
+            try:
+                replay.request(url)
+                return url, local.delay
+            except urllib.error.URLError:
+                return url, 'failed'
+
+        results = []
+        with mock.patch.object(transport.time, 'sleep', sleep):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for round_ in range(rounds):
+                    results.extend(executor.map(run, order))
+
+        # Requests for the same URL are interchangeable, so compare the multiset of outcomes per URL
+        for url, outcome in results:
+            delays.setdefault(url, []).append(outcome)
+        return {url: sorted(outcome, key=str) for url, outcome in delays.items()}
+
+    def test_same_seed_same_outcomes( self ):
+        first = self.outcomes(7, PAGES)
+        self.assertEqual(first, self.outcomes(7, PAGES))
+        # Neither the order of the requests nor concurrency changes the outcome
+        self.assertEqual(first, self.outcomes(7, list(reversed(PAGES)), workers=8))
+        failed = sum(outcome.count('failed') for outcome in first.values())
+        self.assertTrue(0 < failed < len(PAGES) * 3)
+
+    def test_other_seed_other_outcomes( self ):
+        self.assertNotEqual(self.outcomes(7, PAGES), self.outcomes(8, PAGES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+""" Transport - the single place upstream HTTP requests go through
+
+Page fetches (extraction.fetch_page) and ranged archive reads (httpfile.HttpFile) both call get_transport().request,
+so the whole pipeline can be pointed at something other than the live hosts:
+
+LiveTransport -       urllib against the real hosts (the default)
+RecordingTransport -  wraps another transport and saves every response, Range requests included, to an archive
+ReplayTransport -     serves responses from such an archive, with optional injected latency and errors
+
+The transport can be chosen from the environment (see configure_from_env):
+    PATENTAPI_TRANSPORT=record:DIR or replay:DIR
+    PATENTAPI_REPLAY_LATENCY_MS, PATENTAPI_REPLAY_JITTER_MS, PATENTAPI_REPLAY_ERROR_RATE, PATENTAPI_REPLAY_SEED
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from backends import DirectoryBackend
+
+# Request headers that change the response, and so are part of an archive key
+KEY_HEADERS = ('Range', 'If-None-Match', 'If-Modified-Since')
+
+
+def _headers( items ):
+    ''' Build a case-insensitive header object like the ones urllib returns (supports get_content_charset) '''
+    from http.client import HTTPMessage
+
+    message = HTTPMessage()
+    for name, value in items:
+        message[name] = value
+    return message
+
+
+class Response ( object ):
+    """ An HTTP response: status code, headers (http.client.HTTPMessage) and body bytes.
+            A response requested with stream=True may have no body yet but an open <stream> instead, to be read with
+            chunks() and closed with close().
+    """
+
+    def __init__( self, url, status, headers, body, stream=None ):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stream = stream
+
+    def chunks( self, size ):
+        ''' Yield the body in pieces of at most <size> bytes, reading a streamed body only as far as it is consumed '''
+        if self.stream is not None:
+            while True:
+                chunk = self.stream.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+        body = self.body or b''
+        for offset in range(0, len(body), size):
+            yield body[offset:offset + size]
+
+    def close( self ):
+        if self.stream is not None:
+            self.stream.close()
+
+    def raise_for_status( self ):
+        ''' Raise urllib.error.HTTPError for 4xx/5xx responses, as urlopen would have '''
+        if self.status >= 400:
+            import io
+            import urllib.error
+            raise urllib.error.HTTPError(self.url, self.status, 'HTTP Error %d' % self.status, self.headers,
+                                         io.BytesIO(self.body))
+
+
+class LiveTransport ( object ):
+
+    def __init__( self, timeout=30 ):
+        self.timeout = timeout
+
+    def request( self, url, headers=None, method='GET', stream=False ):
+        ''' With <stream>, a successful response's body is left unread: see Response.chunks '''
+        import urllib.request, urllib.error
+
+        req = urllib.request.Request(url, headers=headers or {}, method=method)
+        try: resp = urllib.request.urlopen(req, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # Error statuses (and 304) are ordinary responses here; callers decide what to raise
+            return Response(url, e.code, e.headers, e.read() if e.fp else b'')
+
+        if stream and method != 'HEAD':
+            return Response(url, resp.status, resp.headers, None, stream=resp)
+        with resp:
+            body = resp.read() if method != 'HEAD' else b''
+        return Response(url, resp.status, resp.headers, body)
+
+
+def archive_key( url, headers=None, method='GET' ):
+    ''' Archive key of a request: a hash of the method, URL and the headers that change the response '''
+    headers = headers or {}
+    parts = [method, url] + ['%s: %s' % (name, headers[name]) for name in KEY_HEADERS if headers.get(name)]
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class RecordingTransport ( object ):
+    """ Passes requests to <inner> (live by default) and records each response under <directory>.
+            Responses are always read whole, since the archive needs the whole body; <stream> is accepted and ignored.
+    """
+
+    def __init__( self, directory, inner=None ):
+        self.backend = DirectoryBackend(directory)
+        self.inner = inner or LiveTransport()
+
+    def request( self, url, headers=None, method='GET', stream=False ):
+        started = time.monotonic()
+        response = self.inner.request(url, headers=headers, method=method)
+        elapsed = time.monotonic() - started
+
+        key = archive_key(url, headers, method)
+        meta = {'url': url,
+                'method': method,
+                'request_headers': {name: headers[name] for name in KEY_HEADERS if headers and headers.get(name)},
+                'status': response.status,
+                'headers': list(response.headers.items()),
+                'elapsed': elapsed}
+        self.backend.set('responses/' + key + '.body', response.body)
+        self.backend.set('responses/' + key + '.json', json.dumps(meta).encode('utf-8'))
+        return response
+
+
+class ReplayMiss ( LookupError ):
+    """ The request isn't in the replay archive """
+
+
+class ReplayTransport ( object ):
+    """ Serves recorded responses from <directory>; nothing goes to the network.
+            <latency> and <jitter> (seconds) are added to every request: latency + uniform(0, jitter).
+            With latency='recorded', the time the original request took is replayed instead.
+            <error_rate> is the fraction of requests that fail with a URLError instead.
+            <seed> makes the jitter and injected errors reproducible.  Each request draws them from its own generator,
+            seeded with (seed, archive key, how many times that key was requested before), so the outcome doesn't
+            depend on the order concurrent workers' requests arrive in.
+            Bodies are read whole from the archive; <stream> is accepted and ignored.
+    """
+
+    def __init__( self, directory, latency=0.0, jitter=0.0, error_rate=0.0, seed=None ):
+        self.backend = DirectoryBackend(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.__occurrences = {}             # archive key -> requests for it so far
+        self.__lock = threading.Lock()
+
+    def request( self, url, headers=None, method='GET', stream=False ):
+        key = archive_key(url, headers, method)
+        meta = self.backend.get('responses/' + key + '.json')
+        if meta is None:
+            raise ReplayMiss('No recorded response for %s %s %s' % (method, url, headers or ''))
+        meta = json.loads(meta.decode('utf-8'))
+
+        with self.__lock:
+            occurrence = self.__occurrences.get(key, 0)
+            self.__occurrences[key] = occurrence + 1
+        draws = random.Random('%s:%s:%d' % (self.seed, key, occurrence))
+        jitter = draws.uniform(0, self.jitter) if self.jitter else 0.0
+        fail = self.error_rate and draws.random() < self.error_rate
+
+        delay = meta['elapsed'] if self.latency == 'recorded' else self.latency + jitter
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            import urllib.error
+            raise urllib.error.URLError('injected failure')
+
+        body = self.backend.get('responses/' + key + '.body') or b''
+        return Response(url, meta['status'], _headers(meta['headers']), body)
+
+
+#-----------------------------------------------------------------------
+# Selection
+#-----------------------------------------------------------------------
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def configure_from_env( environ=os.environ ):
+    ''' Build the transport described by PATENTAPI_TRANSPORT (live when unset) '''
+    setting = environ.get('PATENTAPI_TRANSPORT', 'live')
+    mode, _, directory = setting.partition(':')
+
+    if mode == 'record':
+        return RecordingTransport(directory)
+    if mode == 'replay':
+        latency = environ.get('PATENTAPI_REPLAY_LATENCY_MS', '0')
+        seed = environ.get('PATENTAPI_REPLAY_SEED')
+        return ReplayTransport(directory,
+                               latency='recorded' if latency == 'recorded' else float(latency) / 1000.0,
+                               jitter=float(environ.get('PATENTAPI_REPLAY_JITTER_MS', '0')) / 1000.0,
+                               error_rate=float(environ.get('PATENTAPI_REPLAY_ERROR_RATE', '0')),
+                               seed=int(seed) if seed else None)
+    if mode == 'live':
+        return LiveTransport()
+    raise ValueError("Unknown PATENTAPI_TRANSPORT, '" + setting + "'.")
+
+
+def get_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = configure_from_env()
+        return _transport
+
+
+def set_transport( transport ):
+    ''' Use <transport> for every upstream request from now on (None goes back to the environment's choice) '''
+    global _transport
+    with _transport_lock:
+        _transport = transport